@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+# benchmark.py: time the result pipeline and the routes of online_quiz.py on synthetic quizzes
+# usage: benchmark.py [-p 10,100,1000] [-q 40,120] [-r 3] [-o results.json]
+#        benchmark.py --compare old.json new.json
+# the quizzes are made by generate_quiz.py in a temporary data directory
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARK_DIR)
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import generate_quiz
+
+
+ERROR_PAGE_TEXT = "An error occurred"
+
+
+def reset_quiz_state(online_quiz, quiz_id):
+    # forget everything a long-running server would have kept in memory
+    online_quiz.quiz_states.pop(quiz_id, None)
+    online_quiz.scoreboards.pop(quiz_id, None)
+
+
+def time_function(function, repeat):
+    timings = []
+    for i in range(0, repeat):
+        start_time = time.perf_counter()
+        function()
+        timings.append(time.perf_counter()-start_time)
+    return(timings)
+
+
+def make_stages(online_quiz, quiz_id, host_id, host_ip, checkee_id, nbr_of_questions):
+    def in_request(function, cold=False):
+        def run():
+            if cold:
+                reset_quiz_state(online_quiz, quiz_id)
+            with online_quiz.app.test_request_context(environ_base={"REMOTE_ADDR": host_ip}):
+                function()
+        return(run)
+    return([ ("get_quiz_version", in_request(lambda: online_quiz.get_quiz_version(quiz_id))),
+             ("read_results_cold", in_request(lambda: online_quiz.read_results(quiz_id), cold=True)),
+             ("read_results_warm", in_request(lambda: online_quiz.read_results(quiz_id))),
+             ("read_results_from_logfile", in_request(lambda: online_quiz.read_results_from_logfile(quiz_id))),
+             ("read_answers_no_ip", in_request(lambda: online_quiz.read_answers_no_ip(quiz_id, nbr_of_questions, checkee_id))),
+             ("read_checks", in_request(lambda: online_quiz.read_checks(quiz_id, nbr_of_questions, checkee_id))),
+             ("make_quiz_result_text_all", in_request(lambda: online_quiz.make_quiz_result_text_all(quiz_id))) ])
+
+
+def make_routes(online_quiz, quiz_id, host_id, host_ip, checkee_id):
+    client = online_quiz.app.test_client()
+    host_form = { "quiz_id": quiz_id, "participant_id": host_id }
+    def post(route, form):
+        def run():
+            response = client.post("/"+route, data=form, environ_base={"REMOTE_ADDR": host_ip})
+            body = response.get_data()
+            if response.status_code != 200 or ERROR_PAGE_TEXT.encode("utf-8") in body:
+                raise ValueError("route {0} failed: {1}".format(route, body[:500]))
+        return(run)
+    def get(route):
+        def run():
+            response = client.get("/"+route, environ_base={"REMOTE_ADDR": host_ip})
+            response.get_data()
+            if response.status_code != 200:
+                raise ValueError("route {0} failed: {1}".format(route, response.status_code))
+        return(run)
+    return([ ("wait", post(online_quiz.WAIT, host_form)),
+             ("examine_results", post(online_quiz.EXAMINE_RESULTS, host_form)),
+             ("check_answers", post(online_quiz.CHECK_ANSWERS, dict(host_form, page_nbr="1", participant_id_check=checkee_id))),
+             ("show_answers", post("show_answers", host_form)),
+             ("download_all", post(online_quiz.DOWNLOAD_ALL, host_form)),
+             ("results_json", get(online_quiz.RESULTS_JSON+"?quiz_id="+quiz_id)) ])
+
+
+def measure_quiz_state(online_quiz, quiz_id, nbr_of_participants, nbr_of_questions):
+    # memory kept by a long-running server for one quiz, built from cold
+    reset_quiz_state(online_quiz, quiz_id)
+    tracemalloc.start()
+    quiz_state = online_quiz.get_quiz_state(quiz_id)
+    online_quiz.update_quiz_state(quiz_id, quiz_state)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    reset_quiz_state(online_quiz, quiz_id)
+    return({ "name": "quiz_state",
+             "participants": nbr_of_participants,
+             "questions": nbr_of_questions,
+             "bytes": size,
+             "peak_bytes": peak,
+             "bytes_per_participant": size/nbr_of_participants })
+
+
+def summarize(name, kind, nbr_of_participants, nbr_of_questions, timings):
+    return({ "name": name,
+             "kind": kind,
+             "participants": nbr_of_participants,
+             "questions": nbr_of_questions,
+             "repeat": len(timings),
+             "min": min(timings),
+             "median": statistics.median(timings),
+             "mean": statistics.mean(timings) })
+
+
+def get_commit():
+    try:
+        return(subprocess.run(["git", "rev-parse", "HEAD"], cwd=BENCHMARK_DIR, capture_output=True, text=True).stdout.strip())
+    except OSError:
+        return("")
+
+
+def run_benchmarks(participant_counts, question_counts, repeat):
+    data_dir = tempfile.mkdtemp(prefix="online_quiz_benchmark_")+"/"
+    try:
+        outfile = open(data_dir+".env", "w")
+        print('SECRET_KEY="benchmark"', file=outfile)
+        outfile.close()
+        os.environ["ONLINE_QUIZ_DATA_DIR"] = data_dir
+        import online_quiz
+        results = []
+        memory = []
+        for nbr_of_participants in participant_counts:
+            for nbr_of_questions in question_counts:
+                quiz_id, host_id, ip_addresses = generate_quiz.generate_quiz(data_dir, nbr_of_participants, nbr_of_questions)
+                host_ip = ip_addresses[host_id]
+                checkee_id = [ participant_id for participant_id in ip_addresses if participant_id != host_id ][0] if nbr_of_participants > 1 else host_id
+                benchmarks = [ (name, "stage", function) for name, function in make_stages(online_quiz, quiz_id, host_id, host_ip, checkee_id, str(nbr_of_questions)) ]
+                benchmarks += [ (name, "route", function) for name, function in make_routes(online_quiz, quiz_id, host_id, host_ip, checkee_id) ]
+                for name, kind, function in benchmarks:
+                    timings = time_function(function, repeat)
+                    results.append(summarize(name, kind, nbr_of_participants, nbr_of_questions, timings))
+                    print("{0:>5} participants {1:>4} questions {2:<26} {3:10.4f}s".format(nbr_of_participants, nbr_of_questions, name, results[-1]["median"]), file=sys.stderr)
+                memory.append(measure_quiz_state(online_quiz, quiz_id, nbr_of_participants, nbr_of_questions))
+                print("{0:>5} participants {1:>4} questions {2:<26} {3:10.0f} bytes per participant".format(nbr_of_participants, nbr_of_questions, "quiz_state", memory[-1]["bytes_per_participant"]), file=sys.stderr)
+    finally:
+        shutil.rmtree(data_dir)
+    return({ "commit": get_commit(),
+             "python": platform.python_version(),
+             "platform": platform.platform(),
+             "date": time.strftime("%Y%m%d:%H:%M:%S"),
+             "repeat": repeat,
+             "results": results,
+             "memory": memory })
+
+
+def compare(old_file_name, new_file_name):
+    infile = open(old_file_name, "r")
+    old_report = json.load(infile)
+    infile.close()
+    infile = open(new_file_name, "r")
+    new_report = json.load(infile)
+    infile.close()
+    old_results, new_results = old_report["results"], new_report["results"]
+    old_medians = { (result["name"], result["participants"], result["questions"]): result["median"] for result in old_results }
+    for result in new_results:
+        key = (result["name"], result["participants"], result["questions"])
+        if key in old_medians and old_medians[key] > 0:
+            print("{0:>5} participants {1:>4} questions {2:<26} {3:10.4f}s {4:10.4f}s {5:6.2f}x".format(key[1], key[2], key[0], old_medians[key], result["median"], result["median"]/old_medians[key]))
+    # reports from before the memory measurement have no memory key
+    old_memory = { (result["name"], result["participants"], result["questions"]): result["bytes_per_participant"] for result in old_report.get("memory", []) }
+    for result in new_report.get("memory", []):
+        key = (result["name"], result["participants"], result["questions"])
+        if key in old_memory and old_memory[key] > 0:
+            print("{0:>5} participants {1:>4} questions {2:<26} {3:10.0f}B {4:10.0f}B {5:6.2f}x".format(key[1], key[2], key[0], old_memory[key], result["bytes_per_participant"], result["bytes_per_participant"]/old_memory[key]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmark online_quiz.py on synthetic quizzes")
+    parser.add_argument("-p", "--participants", default="10,100,1000", help="comma-separated numbers of participants")
+    parser.add_argument("-q", "--questions", default="40,120", help="comma-separated numbers of questions")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="timings per benchmark")
+    parser.add_argument("-o", "--output", help="JSON output file (default: standard output)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare the medians of two output files")
+    args = parser.parse_args()
+    if args.compare:
+        compare(args.compare[0], args.compare[1])
+        sys.exit(0)
+    report = run_benchmarks([ int(value) for value in args.participants.split(",") ], [ int(value) for value in args.questions.split(",") ], args.repeat)
+    if args.output:
+        outfile = open(args.output, "w")
+        json.dump(report, outfile, indent=1)
+        outfile.close()
+    else:
+        print(json.dumps(report, indent=1))
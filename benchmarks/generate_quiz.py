@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+# generate_quiz.py: write a synthetic online quiz in the log format of online_quiz.py
+# usage: generate_quiz.py data_dir nbr_of_participants nbr_of_questions [answer_churn [check_churn [seed]]]
+# churn: fraction of answers and checks which are changed once more later on
+
+import csv
+import datetime
+import os
+import random
+import sys
+
+
+START_QUIZ = "START_QUIZ"
+PARTICIPANT = "PARTICIPANT"
+ANSWER = "ANSWER"
+STATUS = "STATUS"
+CHECK = "CHECK"
+CHECKER = "CHECKER"
+LOG_FILE = "logfile.csv"
+DATE_FORMAT = "%Y%m%d:%H:%M:%S"
+MIN_RAND_NBR = 10000000
+MAX_RAND_NBR = 99999999
+ANSWER_VARIANTS = 4 # different answers per question, the first one is correct
+
+
+def make_quiz_log(data_dir, quiz_id, start_time):
+    return({ "quiz_dir": os.path.join(data_dir, quiz_id), "time": start_time, "files": {} })
+
+
+def write_row(quiz_log, row, participant_id=None):
+    # every row is a second later, like a quiz played at high speed
+    quiz_log["time"] += datetime.timedelta(seconds=1)
+    file_name = LOG_FILE if participant_id == None else participant_id
+    if file_name not in quiz_log["files"]:
+        quiz_log["files"][file_name] = []
+    quiz_log["files"][file_name].append([quiz_log["time"].strftime(DATE_FORMAT)]+[str(value) for value in row])
+
+
+def save_quiz_log(quiz_log):
+    os.makedirs(quiz_log["quiz_dir"])
+    for file_name in quiz_log["files"]:
+        # csv.writer with default settings, as used by write_log
+        outfile = open(os.path.join(quiz_log["quiz_dir"], file_name), "w", newline="")
+        csv.writer(outfile).writerows(quiz_log["files"][file_name])
+        outfile.close()
+
+
+def make_answer(question_nbr, variant):
+    if variant == 0:
+        return("answer {0}".format(question_nbr))
+    return("answer {0} variant {1}".format(question_nbr, variant))
+
+
+def generate_quiz(data_dir, nbr_of_participants, nbr_of_questions, answer_churn=0.2, check_churn=0.1, seed=1):
+    randomizer = random.Random(seed)
+    quiz_id = str(randomizer.randint(MIN_RAND_NBR, MAX_RAND_NBR))
+    while os.path.exists(os.path.join(data_dir, quiz_id)):
+        quiz_id = str(randomizer.randint(MIN_RAND_NBR, MAX_RAND_NBR))
+    participant_ids = []
+    while len(participant_ids) < nbr_of_participants:
+        participant_id = str(randomizer.randint(MIN_RAND_NBR, MAX_RAND_NBR))
+        if participant_id not in participant_ids:
+            participant_ids.append(participant_id)
+    ip_addresses = { participant_id: "10.{0}.{1}.{2}".format(i//65536, (i//256)%256, i%256) for i, participant_id in enumerate(participant_ids) }
+    host_id = participant_ids[0]
+    quiz_log = make_quiz_log(data_dir, quiz_id, datetime.datetime(2021, 1, 1, 20, 0, 0))
+    write_row(quiz_log, [START_QUIZ, quiz_id, "Benchmark quiz", nbr_of_questions, host_id, ip_addresses[host_id]])
+    for i, participant_id in enumerate(participant_ids):
+        write_row(quiz_log, [PARTICIPANT, quiz_id, ip_addresses[participant_id], participant_id, "Team {0}".format(i)], participant_id)
+        write_row(quiz_log, [STATUS, quiz_id, ip_addresses[participant_id], participant_id, "waiting"], participant_id)
+    write_row(quiz_log, [ANSWER, quiz_id, ip_addresses[host_id], host_id, "1", ""])
+    answers = {}
+    for participant_id in participant_ids:
+        ip_address = ip_addresses[participant_id]
+        write_row(quiz_log, [STATUS, quiz_id, ip_address, participant_id, "started"])
+        write_row(quiz_log, [STATUS, quiz_id, ip_address, participant_id, "started"], participant_id)
+        answers[participant_id] = {}
+        for question_nbr in range(1, nbr_of_questions+1):
+            variant = randomizer.randrange(ANSWER_VARIANTS)
+            write_row(quiz_log, [ANSWER, quiz_id, ip_address, participant_id, question_nbr, make_answer(question_nbr, variant)], participant_id)
+            answers[participant_id][question_nbr] = variant
+        for question_nbr in range(1, nbr_of_questions+1):
+            if randomizer.random() < answer_churn:
+                variant = randomizer.randrange(ANSWER_VARIANTS)
+                write_row(quiz_log, [ANSWER, quiz_id, ip_address, participant_id, question_nbr, make_answer(question_nbr, variant)], participant_id)
+                answers[participant_id][question_nbr] = variant
+        write_row(quiz_log, [STATUS, quiz_id, ip_address, participant_id, "finished"], participant_id)
+    # every participant checks the previous one, as in open_checking
+    checkers = participant_ids[:]
+    randomizer.shuffle(checkers)
+    for i in range(0, len(checkers)):
+        write_row(quiz_log, [CHECKER, quiz_id, checkers[i], checkers[i-1]], checkers[i])
+    for i in range(0, len(checkers)):
+        checker, checkee = checkers[i], checkers[i-1]
+        write_row(quiz_log, [STATUS, quiz_id, ip_addresses[checker], checker, "checking"], checker)
+        for question_nbr in range(1, nbr_of_questions+1):
+            check = "correct" if answers[checkee][question_nbr] == 0 else "wrong"
+            write_row(quiz_log, [CHECK, quiz_id, checkee, checker, question_nbr, check], checkee)
+        for question_nbr in range(1, nbr_of_questions+1):
+            if randomizer.random() < check_churn:
+                check = "correct" if randomizer.random() < 0.5 else "wrong"
+                write_row(quiz_log, [CHECK, quiz_id, checkee, checker, question_nbr, check], checkee)
+    save_quiz_log(quiz_log)
+    return(quiz_id, host_id, ip_addresses)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or len(sys.argv) > 7:
+        sys.exit("usage: generate_quiz.py data_dir nbr_of_participants nbr_of_questions [answer_churn [check_churn [seed]]]")
+    data_dir = sys.argv[1]
+    nbr_of_participants, nbr_of_questions = int(sys.argv[2]), int(sys.argv[3])
+    answer_churn = float(sys.argv[4]) if len(sys.argv) > 4 else 0.2
+    check_churn = float(sys.argv[5]) if len(sys.argv) > 5 else 0.1
+    seed = int(sys.argv[6]) if len(sys.argv) > 6 else 1
+    quiz_id, host_id, ip_addresses = generate_quiz(data_dir, nbr_of_participants, nbr_of_questions, answer_churn, check_churn, seed)
+    print("quiz {0}: host {1} at {2}".format(quiz_id, host_id, ip_addresses[host_id]))
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+# startup.py: time a fresh process per request, as online_quiz.cgi runs, from import to first byte per route
+# usage: startup.py [-p 100] [-q 40] [-r 5] [-o results.json]
+# every route is timed without a template cache, with an empty cache and
+# with a cache filled by an earlier process
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+
+CACHE_MODES = [ "off", "cold", "warm" ]
+
+
+def run_child(request_spec):
+    # runs in the timed process: nothing is imported before the clock starts
+    start_time = time.perf_counter()
+    sys.path.insert(0, REPOSITORY_DIR)
+    import online_quiz
+    import_time = time.perf_counter()-start_time
+    from werkzeug.test import EnvironBuilder
+    environ = EnvironBuilder(path=request_spec["path"], method=request_spec["method"], data=request_spec["form"], environ_base={"REMOTE_ADDR": request_spec["ip_address"]}).get_environ()
+    response_status = []
+    def start_response(status, headers, exc_info=None):
+        response_status.append(status)
+    body = iter(online_quiz.app(environ, start_response))
+    first_chunk = next(body, b"")
+    first_byte_time = time.perf_counter()-start_time
+    for chunk in body:
+        pass
+    print(json.dumps({ "import": import_time, "first_byte": first_byte_time, "status": response_status[0], "bytes": len(first_chunk) }))
+
+
+def make_requests(quiz_id, host_id, checkee_id):
+    # online_quiz is not imported here, so that the parent stays small
+    host_form = { "quiz_id": quiz_id, "participant_id": host_id }
+    return([ ("index", "/", "GET", {}),
+             ("wait", "/wait", "POST", host_form),
+             ("enter_answers", "/enter_answers", "POST", dict(host_form, page_nbr="1")),
+             ("examine_results", "/examine_results", "POST", host_form),
+             ("check_answers", "/check_answers", "POST", dict(host_form, page_nbr="1", participant_id_check=checkee_id)),
+             ("results_json", "/results_json?quiz_id="+quiz_id, "GET", {}) ])
+
+
+def time_request(request_spec, data_dir, cache_dir):
+    env = dict(os.environ, ONLINE_QUIZ_DATA_DIR=data_dir, ONLINE_QUIZ_TEMPLATE_CACHE=cache_dir)
+    start_time = time.perf_counter()
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(request_spec)], env=env, capture_output=True, text=True)
+    wall_time = time.perf_counter()-start_time
+    if process.returncode != 0:
+        raise ValueError("request {0} failed: {1}".format(request_spec["path"], process.stderr[-2000:]))
+    timings = json.loads(process.stdout.strip().split("\n")[-1])
+    if not timings["status"].startswith("200"):
+        raise ValueError("request {0} failed: {1}".format(request_spec["path"], timings["status"]))
+    timings["wall"] = wall_time
+    return(timings)
+
+
+def run_benchmarks(nbr_of_participants, nbr_of_questions, repeat):
+    import generate_quiz
+    data_dir = tempfile.mkdtemp(prefix="online_quiz_startup_")+"/"
+    try:
+        outfile = open(data_dir+".env", "w")
+        print('SECRET_KEY="benchmark"', file=outfile)
+        outfile.close()
+        quiz_id, host_id, ip_addresses = generate_quiz.generate_quiz(data_dir, nbr_of_participants, nbr_of_questions)
+        checkee_id = [ participant_id for participant_id in ip_addresses if participant_id != host_id ][0] if nbr_of_participants > 1 else host_id
+        results = []
+        for name, path, method, form in make_requests(quiz_id, host_id, checkee_id):
+            request_spec = { "path": path, "method": method, "form": form, "ip_address": ip_addresses[host_id] }
+            for cache_mode in CACHE_MODES:
+                timings = []
+                for i in range(0, repeat):
+                    cache_dir = ""
+                    if cache_mode != "off":
+                        cache_dir = data_dir+".template_cache_"+name+"/"
+                        if cache_mode == "cold" or i == 0:
+                            shutil.rmtree(cache_dir, ignore_errors=True)
+                        if cache_mode == "warm" and i == 0:
+                            time_request(request_spec, data_dir, cache_dir)
+                    timings.append(time_request(request_spec, data_dir, cache_dir))
+                result = { "name": name, "cache": cache_mode, "participants": nbr_of_participants, "questions": nbr_of_questions, "repeat": repeat }
+                for measure in ("import", "first_byte", "wall"):
+                    result[measure] = statistics.median([ timing[measure] for timing in timings ])
+                results.append(result)
+                print("{0:<16} {1:<5} import {2:8.4f}s first byte {3:8.4f}s process {4:8.4f}s".format(name, cache_mode, result["import"], result["first_byte"], result["wall"]), file=sys.stderr)
+    finally:
+        shutil.rmtree(data_dir)
+    return({ "python": platform.python_version(),
+             "platform": platform.platform(),
+             "date": time.strftime("%Y%m%d:%H:%M:%S"),
+             "repeat": repeat,
+             "results": results })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="time online_quiz.py from process start to first byte per route")
+    parser.add_argument("-p", "--participants", type=int, default=100, help="number of participants of the quiz")
+    parser.add_argument("-q", "--questions", type=int, default=40, help="number of questions of the quiz")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="processes per route and cache mode")
+    parser.add_argument("-o", "--output", help="JSON output file (default: standard output)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(json.loads(args.child))
+        sys.exit(0)
+    report = run_benchmarks(args.participants, args.questions, args.repeat)
+    if args.output:
+        outfile = open(args.output, "w")
+        json.dump(report, outfile, indent=1)
+        outfile.close()
+    else:
+        print(json.dumps(report, indent=1))
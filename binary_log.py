@@ -0,0 +1,228 @@
+#!/usr/bin/python3
+# binary_log.py: compact binary storage of online quiz log files
+# usage: binary_log.py to_binary|to_csv quiz_dir
+# each record: length (uint32), event type (uint8), timestamp (uint64),
+# fixed-width fields; strings are interned in STRING records
+
+import csv
+import fcntl
+import os
+import re
+import struct
+import sys
+import threading
+from collections import OrderedDict
+
+
+BINARY_SUFFIX = ".bin"
+CSV_LOG_FILE = "logfile.csv"
+BINARY_LOG_FILE = "logfile.bin"
+HEADER = struct.Struct("<IB")
+TIMESTAMP = struct.Struct("<Q")
+STRING = 0
+RAW = 255
+EVENT_TYPES = { "START_QUIZ": 1, "END_QUIZ": 2, "PARTICIPANT": 3, "ANSWER": 4, "STATUS": 5, "CHECK": 6, "CHECKER": 7 }
+EVENT_NAMES = { EVENT_TYPES[event]: event for event in EVENT_TYPES }
+# field types: I = integer id, H = question number, S = interned string
+EVENT_FIELDS = { "START_QUIZ": "ISIIS",
+                 "PARTICIPANT": "ISIS",
+                 "ANSWER": "ISIHS",
+                 "STATUS": "ISIS",
+                 "CHECK": "IIIHS",
+                 "CHECKER": "III" }
+FIELD_MAX = { "I": 2**32, "H": 2**16 }
+EVENT_STRUCTS = { EVENT_TYPES[event]: struct.Struct("<"+re.sub("S", "I", EVENT_FIELDS[event])) for event in EVENT_FIELDS }
+TIMESTAMP_PATTERN = re.compile(r"^(\d{8}):(\d\d):(\d\d):(\d\d)$")
+MAX_STRING_TABLES = 1024 # files whose strings are kept; others are read again from the start
+
+string_tables = OrderedDict()
+string_tables_lock = threading.Lock()
+
+
+def get_string_table(file_name):
+    if file_name not in string_tables:
+        string_tables[file_name] = { "strings": [], "ids": {}, "offset": 0 }
+        while len(string_tables) > MAX_STRING_TABLES:
+            string_tables.popitem(last=False)
+    string_tables.move_to_end(file_name)
+    return(string_tables[file_name])
+
+
+def add_string(string_table, string):
+    string_table["ids"][string] = len(string_table["strings"])
+    string_table["strings"].append(string)
+
+
+def encode_timestamp(timestamp):
+    match = TIMESTAMP_PATTERN.search(timestamp)
+    if not match or "".join(match.groups()) != str(int("".join(match.groups()))):
+        return(None)
+    return(int("".join(match.groups())))
+
+
+def decode_timestamp(number):
+    digits = str(number)
+    return("{0}:{1}:{2}:{3}".format(digits[:8], digits[8:10], digits[10:12], digits[12:14]))
+
+
+def is_number_field(value, field_type):
+    return(re.search("^[0-9]+$", value) and str(int(value)) == value and int(value) < FIELD_MAX[field_type])
+
+
+def can_encode_row(row):
+    if len(row) < 2 or row[1] not in EVENT_FIELDS or len(row) != 2+len(EVENT_FIELDS[row[1]]):
+        return(False)
+    if encode_timestamp(row[0]) == None:
+        return(False)
+    for value, field_type in zip(row[2:], EVENT_FIELDS[row[1]]):
+        if field_type != "S" and not is_number_field(value, field_type):
+            return(False)
+    return(True)
+
+
+def encode_string_id(string_table, string, data):
+    if string not in string_table["ids"]:
+        string_bytes = string.encode("utf-8")
+        data.append(HEADER.pack(len(string_bytes), STRING)+string_bytes)
+        add_string(string_table, string)
+    return(string_table["ids"][string])
+
+
+def encode_row(string_table, row):
+    data = []
+    row = [ str(value) for value in row ]
+    if can_encode_row(row):
+        event_type = EVENT_TYPES[row[1]]
+        values = []
+        for value, field_type in zip(row[2:], EVENT_FIELDS[row[1]]):
+            if field_type == "S":
+                values.append(encode_string_id(string_table, value, data))
+            else:
+                values.append(int(value))
+        payload = TIMESTAMP.pack(encode_timestamp(row[0]))+EVENT_STRUCTS[event_type].pack(*values)
+    else:
+        event_type = RAW
+        values = [ encode_string_id(string_table, value, data) for value in row ]
+        payload = struct.pack("<{0}I".format(len(values)), *values)
+    data.append(HEADER.pack(len(payload), event_type)+payload)
+    return(b"".join(data))
+
+
+def decode_record(string_table, event_type, payload):
+    strings = string_table["strings"]
+    if event_type == RAW:
+        return([ strings[string_id] for string_id in struct.unpack("<{0}I".format(len(payload)//4), payload) ])
+    event = EVENT_NAMES[event_type]
+    row = [ decode_timestamp(TIMESTAMP.unpack_from(payload)[0]), event ]
+    for value, field_type in zip(EVENT_STRUCTS[event_type].unpack_from(payload, TIMESTAMP.size), EVENT_FIELDS[event]):
+        if field_type == "S":
+            row.append(strings[value])
+        else:
+            row.append(str(value))
+    return(row)
+
+
+def read_rows_from_file(infile, file_name, offset=0, events=None):
+    string_table = get_string_table(file_name)
+    infile.seek(0, os.SEEK_END)
+    if infile.tell() < string_table["offset"]:
+        del string_tables[file_name]
+        string_table = get_string_table(file_name)
+    # strings defined before offset are needed to decode the rows after it
+    start = min(offset, string_table["offset"])
+    infile.seek(start)
+    data = infile.read()
+    event_types = None
+    if events != None:
+        event_types = { EVENT_TYPES[event] for event in events if event in EVENT_TYPES } | { RAW }
+    rows = []
+    position = 0
+    while position+HEADER.size <= len(data):
+        length, event_type = HEADER.unpack_from(data, position)
+        if position+HEADER.size+length > len(data):
+            break
+        payload = data[position+HEADER.size:position+HEADER.size+length]
+        if event_type == STRING:
+            if start+position >= string_table["offset"]:
+                add_string(string_table, payload.decode("utf-8"))
+        elif start+position >= offset and (event_types == None or event_type in event_types):
+            row = decode_record(string_table, event_type, payload)
+            # raw rows can hold any event: filter them as the CSV reader does
+            if event_type != RAW or events == None or (len(row) > 2 and row[1] in events):
+                rows.append(row)
+        position += HEADER.size+length
+    string_table["offset"] = max(string_table["offset"], start+position)
+    return(rows, start+position)
+
+
+def read_rows(file_name, offset=0, events=None):
+    with string_tables_lock:
+        infile = open(file_name, "rb")
+        fcntl.flock(infile, fcntl.LOCK_SH)
+        rows, offset = read_rows_from_file(infile, file_name, offset=offset, events=events)
+        infile.close()
+    return(rows, offset)
+
+
+def append_rows(file_name, rows):
+    # the lock keeps the interned strings of concurrent writers consistent
+    with string_tables_lock:
+        outfile = open(file_name, "a+b")
+        fcntl.flock(outfile, fcntl.LOCK_EX)
+        end = outfile.seek(0, os.SEEK_END)
+        read_rows_from_file(outfile, file_name, offset=end)
+        string_table = get_string_table(file_name)
+        data = b"".join([ encode_row(string_table, row) for row in rows ])
+        outfile.write(data)
+        outfile.close()
+        string_table["offset"] += len(data)
+
+
+def list_log_files(quiz_dir):
+    log_files = []
+    for file_name in sorted(os.listdir(quiz_dir)):
+        if file_name == CSV_LOG_FILE or re.search("^[0-9]+$", file_name):
+            log_files.append(file_name)
+    return(log_files)
+
+
+def convert_to_binary(quiz_dir):
+    for file_name in list_log_files(quiz_dir):
+        infile = open(os.path.join(quiz_dir, file_name), "r", newline="")
+        rows = [ row for row in csv.reader(infile) ]
+        infile.close()
+        if file_name == CSV_LOG_FILE:
+            binary_file_name = os.path.join(quiz_dir, BINARY_LOG_FILE)
+        else:
+            binary_file_name = os.path.join(quiz_dir, file_name+BINARY_SUFFIX)
+        if os.path.isfile(binary_file_name):
+            raise ValueError("file exists: {0}".format(binary_file_name))
+        append_rows(binary_file_name, rows)
+        if read_rows(binary_file_name)[0] != rows:
+            raise ValueError("conversion failed: {0}".format(file_name))
+    for file_name in list_log_files(quiz_dir):
+        os.remove(os.path.join(quiz_dir, file_name))
+
+
+def convert_to_csv(quiz_dir):
+    for file_name in sorted(os.listdir(quiz_dir)):
+        if file_name == BINARY_LOG_FILE:
+            csv_file_name = os.path.join(quiz_dir, CSV_LOG_FILE)
+        elif re.search("^[0-9]+"+re.escape(BINARY_SUFFIX)+"$", file_name):
+            csv_file_name = os.path.join(quiz_dir, file_name[:-len(BINARY_SUFFIX)])
+        else:
+            continue
+        rows, offset = read_rows(os.path.join(quiz_dir, file_name))
+        outfile = open(csv_file_name, "x", newline="")
+        csv.writer(outfile).writerows(rows)
+        outfile.close()
+        os.remove(os.path.join(quiz_dir, file_name))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in ("to_binary", "to_csv"):
+        sys.exit("usage: binary_log.py to_binary|to_csv quiz_dir")
+    if sys.argv[1] == "to_binary":
+        convert_to_binary(sys.argv[2])
+    else:
+        convert_to_csv(sys.argv[2])
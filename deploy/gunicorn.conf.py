@@ -0,0 +1,12 @@
+# gunicorn.conf.py: sample gunicorn configuration for online quiz
+# usage: ONLINE_QUIZ_DATA_DIR=/path/to/quizzes/ gunicorn -c deploy/gunicorn.conf.py online_quiz_wsgi:application
+
+bind = "127.0.0.1:8000"
+workers = 4
+threads = 8
+# the application is loaded in each worker, not shared through fork
+preload_app = False
+# recycle workers now and then to bound the memory used by old quizzes
+max_requests = 10000
+max_requests_jitter = 1000
+timeout = 60
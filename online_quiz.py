@@ -3,8 +3,15 @@
 # usage: online_quiz.py (from cgi-bin directory)
 # 20201211 erikt(at)xs4all.nl
 
+import concurrent.futures
 import csv
 import datetime
+import fcntl
+import functools
+import hashlib
+import hmac
+import io
+import json
 import time
 import sys
 import os
@@ -16,24 +23,44 @@ if "PYTHONPATH" in os.environ:
 from flask import Flask, Response
 from flask import render_template
 from flask import request
+from flask import g, has_request_context
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
 import locale
 from math import log
 from random import randint
 from random import shuffle
 import re
+import threading
+from collections import OrderedDict
+
+import binary_log
+import participant_record
+import snapshot_log
+import sqlite_log
 
 
 locale.setlocale(category=locale.LC_ALL, locale="en_US.UTF-8")
 
 
 BASE_URL = "/cgi-bin/online_quiz/"
-DATA_DIR = "/home/erikt/xs4all/private/online_quiz/quizzes/"
+DATA_DIR = os.environ.get("ONLINE_QUIZ_DATA_DIR", "/home/erikt/xs4all/private/online_quiz/quizzes/")
+DATABASE_FILE = DATA_DIR+"quizzes.sqlite"
+STORAGE = "csv" # "csv", "binary" or "sqlite": log format of new quizzes
 LOG_FILE = "logfile.csv"
+MANIFEST_FILE = "manifest.json" # quiz details and phases, replaced as a whole on changes
+MANIFEST_FORMAT = 1
+MANIFEST_WRITES = os.environ.get("ONLINE_QUIZ_MANIFEST_WRITES", "1") != "" # "" for read-only jobs: missing manifests are made in memory only
+RESERVED_SUFFIX = ".reserved"
+CSV_STORAGE = "csv"
+BINARY_STORAGE = "binary"
+SQLITE_STORAGE = "sqlite"
 PARTICIPATE = "participate"
 WAIT = "wait"
 ENTER_ANSWERS = "enter_answers"
 EXAMINE_RESULTS = "examine_results"
 CHECK_ANSWERS = "check_answers"
+QUESTIONS_PER_PAGE = 10 # as in enter_answers.html and check_answers.html
 MIN_RAND_NBR = 10000000
 MAX_RAND_NBR = 99999999
 START_QUIZ = "START_QUIZ"
@@ -56,31 +83,325 @@ BACK = "back"
 OPEN_CHECKING = "open_checking"
 OPEN_ANSWERING = "open_answering"
 DATE_FORMAT = "%Y%m%d:%H:%M:%S"
+SCOREBOARD_EVENTS = "scoreboard_events"
+WAIT_FOR_START = "wait_for_start" # served by waiting_room.py
+RESULTS_JSON = "results_json"
+SHOW_ANSWERS = "show_answers"
+MARK_ANSWER_GROUP = "mark_answer_group"
+CHECK_VALUES = [ "correct", "wrong" ]
+RESULT_TABLE = "result_table"
+WAIT_TABLE = "wait_table"
+RESULT_TABLE_CACHE_SIZE = 32*1024*1024 # characters of rendered result tables kept per process
+SCOREBOARD_POLL_INTERVAL = 1.0 # seconds between checks for new quiz events
+SCOREBOARD_KEEP_ALIVE = 15.0
+SCOREBOARD_STREAM_DURATION = 3600.0 # browsers reconnect after this
+LIVE_UPDATES = os.environ.get("ONLINE_QUIZ_LIVE_UPDATES", "") != "" # scoreboard events are served by waiting_room.py: off for plain CGI
+INSTRUMENTATION = os.environ.get("ONLINE_QUIZ_INSTRUMENTATION", "") != "" # per-request metrics, fixed at startup
+METRICS = "metrics"
+METRICS_HEADER = "X-Quiz-Metrics"
+METRICS_ADDRESSES = os.environ.get("ONLINE_QUIZ_METRICS_ADDRESSES", "127.0.0.1,::1").split(",") # clients allowed to read the metrics
+METRICS_BUCKETS = [ 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0 ]
 QUESTION_PREFIXES = [ "Li", "Sc", "Sp", "Wo" ] # [ "Cu", "En", "Hi", "Me" ] # [ "Li", "Sc", "Sp", "Wo" ]
+TEMPLATE_CACHE_DIR = os.environ.get("ONLINE_QUIZ_TEMPLATE_CACHE", DATA_DIR+".template_cache/") # compiled templates shared by all processes; "" turns it off
+NUMPY_MIN_CELLS = 20000 # participants x questions: below this, importing numpy takes longer than scoring without it
+READ_THREADS = 8 # log files read at the same time when the quiz state is refreshed
+READ_THREADS_MIN_FILES = 4 # fewer files are read one after another
+READ_PROCESSES = 4
+READ_PROCESSES_MIN_BYTES = int(os.environ.get("ONLINE_QUIZ_READ_PROCESSES_MIN_BYTES", "0")) # unread log data above which the rows are parsed in spawned worker processes; 0 keeps to threads
+
+
+def make_bytecode_cache(cache_dir):
+    # a CGI process compiles every template it renders: the cache lets the
+    # next process load the compiled code instead
+    if cache_dir == "":
+        return(None)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        return(None)
+    return(FileSystemBytecodeCache(cache_dir))
 
 
 app = Flask(__name__)
-dot_env_file = open(DATA_DIR+".env", "r")
-for line in dot_env_file:
-    if re.search("^SECRET_KEY", line):
-        app.config['SECRET_KEY'] = line.split('"')[1]
-dot_env_file.close()
+app.jinja_options = dict(app.jinja_options, bytecode_cache=make_bytecode_cache(TEMPLATE_CACHE_DIR))
+secret_key_loaded = False
+numpy = None
+numpy_loaded = False
+quiz_states = {}
+quiz_states_lock = threading.Lock()
+storage_modes = {}
+manifests = {}
+manifests_lock = threading.Lock()
+scoreboards = {}
+scoreboards_lock = threading.Lock()
+route_metrics = {}
+function_metrics = {}
+metrics_lock = threading.Lock()
+result_tables = OrderedDict()
+result_tables_size = 0
+result_tables_lock = threading.Lock()
+read_pools = {}
+read_pools_lock = threading.Lock()
+
+
+def get_secret_key():
+    global secret_key_loaded
+    # read on first use: many requests do not need it
+    if not secret_key_loaded:
+        dot_env_file = open(DATA_DIR+".env", "r")
+        for line in dot_env_file:
+            if re.search("^SECRET_KEY", line):
+                app.config['SECRET_KEY'] = line.split('"')[1]
+        dot_env_file.close()
+        secret_key_loaded = True
+    return(app.config.get("SECRET_KEY", ""))
+
+
+def load_numpy(nbr_of_cells):
+    global numpy, numpy_loaded
+    # importing numpy takes longer than scoring a small quiz without it,
+    # which matters when every request is a new process
+    if not numpy_loaded and nbr_of_cells >= NUMPY_MIN_CELLS:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None # scores are computed by the loops of add_scores_to_results
+        numpy_loaded = True
+    return(numpy)
 
 
 def get_random_number():
     return(MIN_RAND_NBR+randint(0, 1+MAX_RAND_NBR-MIN_RAND_NBR))
 
 
-def write_log(row_in, quiz_id, participant_id=None):
-    row_out = [datetime.datetime.now().strftime("%Y%m%d:%H:%M:%S")]
-    row_out.extend(row_in)
+def get_request_metrics():
+    if not has_request_context():
+        return(None)
+    if "quiz_metrics" not in g:
+        g.quiz_metrics = { "start": time.perf_counter(), "files": 0, "bytes": 0, "rows": 0, "functions": {} }
+    return(g.quiz_metrics)
+
+
+def make_histogram():
+    return({ "buckets": [ 0 for bound in METRICS_BUCKETS ], "count": 0, "sum": 0.0 })
+
+
+def observe(histogram, value):
+    for i in range(0, len(METRICS_BUCKETS)):
+        if value <= METRICS_BUCKETS[i]:
+            histogram["buckets"][i] += 1
+    histogram["count"] += 1
+    histogram["sum"] += value
+
+
+def count_io(files, nbr_of_bytes, rows):
+    request_metrics = get_request_metrics()
+    if request_metrics != None:
+        request_metrics["files"] += files
+        request_metrics["bytes"] += nbr_of_bytes
+        request_metrics["rows"] += rows
+
+
+def add_function_time(function_name, seconds):
+    request_metrics = get_request_metrics()
+    if request_metrics != None:
+        if function_name not in request_metrics["functions"]:
+            request_metrics["functions"][function_name] = [ 0, 0.0 ]
+        request_metrics["functions"][function_name][0] += 1
+        request_metrics["functions"][function_name][1] += seconds
+    with metrics_lock:
+        if function_name not in function_metrics:
+            function_metrics[function_name] = make_histogram()
+        observe(function_metrics[function_name], seconds)
+
+
+def instrumented(function):
+    # without instrumentation the function itself is used: no overhead
+    if not INSTRUMENTATION:
+        return(function)
+    @functools.wraps(function)
+    def timed_function(*args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            return(function(*args, **kwargs))
+        finally:
+            add_function_time(function.__name__, time.perf_counter()-start_time)
+    return(timed_function)
+
+
+def get_storage_mode(quiz_id):
+    if quiz_id in storage_modes:
+        return(storage_modes[quiz_id])
+    if os.path.isfile(DATA_DIR+quiz_id+"/"+LOG_FILE):
+        storage_modes[quiz_id] = CSV_STORAGE
+    elif os.path.isfile(DATA_DIR+quiz_id+"/"+binary_log.BINARY_LOG_FILE):
+        storage_modes[quiz_id] = BINARY_STORAGE
+    elif os.path.isfile(DATABASE_FILE) and sqlite_log.has_quiz(DATABASE_FILE, quiz_id):
+        storage_modes[quiz_id] = SQLITE_STORAGE
+    else:
+        return(STORAGE)
+    return(storage_modes[quiz_id])
+
+
+def get_log_file_name(quiz_id, participant_id=None):
+    if get_storage_mode(quiz_id) == BINARY_STORAGE:
+        if participant_id == None:
+            return(binary_log.BINARY_LOG_FILE)
+        return(participant_id+binary_log.BINARY_SUFFIX)
     if participant_id == None:
-        outfile = open(DATA_DIR+quiz_id+"/"+LOG_FILE, "a")
+        return(LOG_FILE)
+    return(participant_id)
+
+
+def log_file_exists(quiz_id, participant_id=None):
+    if get_storage_mode(quiz_id) == SQLITE_STORAGE:
+        return(sqlite_log.has_file(DATABASE_FILE, quiz_id, get_log_file_name(quiz_id, participant_id)))
+    return(os.path.isfile(DATA_DIR+quiz_id+"/"+get_log_file_name(quiz_id, participant_id)))
+
+
+def get_log_file_sizes(quiz_id):
+    if get_storage_mode(quiz_id) == SQLITE_STORAGE:
+        return(sqlite_log.get_file_offsets(DATABASE_FILE, quiz_id))
+    log_file_sizes = {}
+    log_file_name = get_log_file_name(quiz_id)
+    participant_file_pattern = "^[0-9]+$"
+    if get_storage_mode(quiz_id) == BINARY_STORAGE:
+        participant_file_pattern = "^[0-9]+"+re.escape(binary_log.BINARY_SUFFIX)+"$"
+    for dir_entry in os.scandir(DATA_DIR+quiz_id):
+        if dir_entry.name == log_file_name or re.search(participant_file_pattern, dir_entry.name):
+            log_file_sizes[dir_entry.name] = dir_entry.stat().st_size
+    return(log_file_sizes)
+
+
+def parse_log_file(quiz_id, file_name, offset=0, events=None):
+    # returns the rows, the new offset and the files, bytes and rows read
+    # for count_io; runs in worker threads and processes, outside requests
+    if get_storage_mode(quiz_id) == BINARY_STORAGE:
+        rows, new_offset = binary_log.read_rows(DATA_DIR+quiz_id+"/"+file_name, offset=offset, events=events)
+        return(rows, new_offset, (1, max(0, new_offset-offset), len(rows)))
+    if get_storage_mode(quiz_id) == SQLITE_STORAGE:
+        rows, new_offset = sqlite_log.read_rows(DATABASE_FILE, quiz_id, file_name, offset=offset, events=events)
+        return(rows, new_offset, (0, 0, len(rows)))
+    infile = open(DATA_DIR+quiz_id+"/"+file_name, "rb")
+    fcntl.flock(infile, fcntl.LOCK_SH)
+    snapshot_rows = []
+    if offset == 0 and file_name != LOG_FILE:
+        # a snapshot replaces the rows before its checkpoint
+        snapshot_rows, offset = snapshot_log.read_snapshot(infile, DATA_DIR+quiz_id+"/"+file_name+snapshot_log.SNAPSHOT_SUFFIX)
+    data = snapshot_log.read_complete_lines(infile, offset)
+    infile.close()
+    rows = [ row for row in snapshot_rows+snapshot_log.parse_rows(data) if events == None or row[1] in events ]
+    return(rows, offset+len(data), (1, len(data), len(snapshot_rows)+data.count(b"\n")))
+
+
+def read_log_rows(quiz_id, file_name, offset=0, events=None):
+    rows, new_offset, io_counts = parse_log_file(quiz_id, file_name, offset=offset, events=events)
+    if INSTRUMENTATION:
+        count_io(*io_counts)
+    return(rows, new_offset)
+
+
+def get_read_pool(kind):
+    with read_pools_lock:
+        if kind not in read_pools:
+            if kind == "processes":
+                # spawned, not forked: a fork of a threaded server process can
+                # copy locks which other threads hold, and hang in the child
+                import multiprocessing
+                read_pools[kind] = concurrent.futures.ProcessPoolExecutor(max_workers=READ_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                read_pools[kind] = concurrent.futures.ThreadPoolExecutor(max_workers=READ_THREADS)
+        return(read_pools[kind])
+
+
+def use_read_processes(nbr_of_bytes):
+    # off by default; mp_context needs Python 3.7
+    if READ_PROCESSES_MIN_BYTES <= 0 or nbr_of_bytes < READ_PROCESSES_MIN_BYTES or (os.cpu_count() or 1) < 2 or sys.version_info < (3, 7):
+        return(False)
+    # no pools within pools, as in the workers of quiz_statistics.py
+    import multiprocessing
+    return(multiprocessing.current_process().name == "MainProcess")
+
+
+def read_log_files(quiz_id, file_offsets, nbr_of_bytes=0):
+    # file_offsets: (file name, offset) pairs; the rows and new offsets are
+    # returned in the same order, however the files were read
+    file_names = [ file_name for file_name, offset in file_offsets ]
+    offsets = [ offset for file_name, offset in file_offsets ]
+    if get_storage_mode(quiz_id) == SQLITE_STORAGE or len(file_offsets) < READ_THREADS_MIN_FILES:
+        file_rows = [ parse_log_file(quiz_id, file_name, offset) for file_name, offset in file_offsets ]
     else:
-        outfile = open(DATA_DIR+quiz_id+"/"+participant_id, "a")
-    csvwriter = csv.writer(outfile)
-    csvwriter.writerow(row_out)
-    outfile.close()
+        # on network file systems, the time goes into opening and reading
+        # files, which threads can wait for at the same time
+        if use_read_processes(nbr_of_bytes):
+            import concurrent.futures.process
+            try:
+                file_rows = list(get_read_pool("processes").map(parse_log_file, [ quiz_id ]*len(file_names), file_names, offsets))
+            except concurrent.futures.process.BrokenProcessPool:
+                with read_pools_lock:
+                    read_pools.pop("processes", None)
+                file_rows = [ parse_log_file(quiz_id, file_name, offset) for file_name, offset in file_offsets ]
+        else:
+            file_rows = list(get_read_pool("threads").map(parse_log_file, [ quiz_id ]*len(file_names), file_names, offsets))
+    if INSTRUMENTATION:
+        for rows, new_offset, io_counts in file_rows:
+            count_io(*io_counts)
+    return([ (rows, new_offset) for rows, new_offset, io_counts in file_rows ])
+
+
+@instrumented
+def write_log(row_in, quiz_id, participant_id=None):
+    write_log_rows([row_in], quiz_id, participant_id=participant_id)
+
+
+@instrumented
+def write_log_rows(rows_in, quiz_id, participant_id=None):
+    time_stamp = datetime.datetime.now().strftime("%Y%m%d:%H:%M:%S")
+    rows_out = [ [time_stamp]+list(row_in) for row_in in rows_in ]
+    file_name = get_log_file_name(quiz_id, participant_id)
+    if get_storage_mode(quiz_id) == BINARY_STORAGE:
+        binary_log.append_rows(DATA_DIR+quiz_id+"/"+file_name, rows_out)
+    elif get_storage_mode(quiz_id) == SQLITE_STORAGE:
+        sqlite_log.append_rows(DATABASE_FILE, quiz_id, file_name, rows_out)
+    else:
+        data = io.StringIO()
+        csvwriter = csv.writer(data)
+        csvwriter.writerows(rows_out)
+        outfile = open(DATA_DIR+quiz_id+"/"+file_name, "ab")
+        fcntl.flock(outfile, fcntl.LOCK_EX)
+        outfile.write(data.getvalue().encode("utf-8"))
+        outfile.close()
+    if INSTRUMENTATION and get_storage_mode(quiz_id) != SQLITE_STORAGE:
+        count_io(1, 0, 0)
+    forget_request_cache(quiz_id)
+
+
+def make_snapshot(quiz_id, participant_id):
+    # answers no longer change after finishing: a good moment to compact
+    if get_storage_mode(quiz_id) == CSV_STORAGE:
+        try:
+            snapshot_log.make_snapshot(DATA_DIR+quiz_id+"/"+participant_id)
+        except Exception:
+            pass
+
+
+def reserve_participant_id(quiz_id):
+    # creating the file with O_EXCL makes the id ours, even if other
+    # processes pick the same random number at the same time
+    for i in range(0, 100):
+        participant_id = str(get_random_number())
+        if get_storage_mode(quiz_id) == SQLITE_STORAGE:
+            file_name = DATA_DIR+quiz_id+"/"+participant_id+RESERVED_SUFFIX
+        else:
+            file_name = DATA_DIR+quiz_id+"/"+get_log_file_name(quiz_id, participant_id)
+        if log_file_exists(quiz_id, participant_id):
+            continue
+        try:
+            os.close(os.open(file_name, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return(participant_id)
+        except FileExistsError:
+            continue
+    raise ValueError("cannot create participant id")
 
 
 def start_new_quiz(request_form):
@@ -105,16 +426,10 @@ def start_new_quiz(request_form):
                     continue
                 else:
                     raise ValueError("cannot create quiz directory")
-        for i in range(0, 100):
-            participant_id = str(get_random_number())
-            if not os.path.isfile(DATA_DIR+quiz_id+"/"+participant_id):
-                break
-            elif i < 99:
-                continue
-            else:
-                raise ValueError("cannot create participant id")
+        participant_id = reserve_participant_id(quiz_id)
         ip_address = request.remote_addr
         write_log([START_QUIZ, quiz_id, quiz_name, int(nbr_of_questions), participant_id, ip_address], quiz_id)
+        write_manifest(quiz_id, make_manifest({ "quiz_name": quiz_name, "nbr_of_questions": str(int(nbr_of_questions)), "participant_id_host": participant_id, "ip_address_host": ip_address, "answering_started": False, "checking_started": False }))
         write_log([PARTICIPANT, quiz_id, ip_address, participant_id, participant_name], quiz_id, participant_id=participant_id)
         write_log([STATUS, quiz_id, ip_address, participant_id, WAITING], quiz_id, participant_id=participant_id)
         return(quiz_id, participant_id, "")
@@ -123,136 +438,296 @@ def start_new_quiz(request_form):
     return("", "", error_text)
 
 
-def read_answers(quiz_id, nbr_of_questions, ip_address, participant_id):
-    answers = { str(i):"" for i in range(1,int(nbr_of_questions)+1) }
-    infile = open(DATA_DIR+quiz_id+"/"+participant_id, "r")
-    csvreader = csv.reader(infile)
-    for row in csvreader:
+def get_page_question_range(page_nbr, nbr_of_questions):
+    first_question_nbr = QUESTIONS_PER_PAGE*(int(page_nbr)-1)+1
+    return(range(max(first_question_nbr, 1), min(first_question_nbr+QUESTIONS_PER_PAGE, int(nbr_of_questions)+1)))
+
+
+def make_question_keys(nbr_of_questions, question_range=None):
+    if question_range == None:
+        question_range = range(1, int(nbr_of_questions)+1)
+    return([ str(i) for i in question_range ])
+
+
+@instrumented
+def read_answers(quiz_id, nbr_of_questions, ip_address, participant_id, question_range=None):
+    # question_range: only these questions are returned, for a single page
+    answers = { key:"" for key in make_question_keys(nbr_of_questions, question_range) }
+    if get_storage_mode(quiz_id) == SQLITE_STORAGE:
+        question_nbrs = None if question_range == None else list(answers)
+        for question_nbr, answer in sqlite_log.read_answers(DATABASE_FILE, quiz_id, participant_id, ip_address=ip_address, question_nbrs=question_nbrs):
+            answers[question_nbr] = answer.strip()
+        return(answers)
+    rows, offset = read_log_rows(quiz_id, get_log_file_name(quiz_id, participant_id), events=[ANSWER])
+    for row in rows:
         try:
-            if row[1] == ANSWER and str(row[2]) == quiz_id and row[3] == ip_address and str(row[4]) == participant_id:
+            if row[1] == ANSWER and str(row[2]) == quiz_id and row[3] == ip_address and str(row[4]) == participant_id and (question_range == None or str(row[5]) in answers):
                 answers[str(row[5])] = str(row[6]).strip()
         except Exception:
             pass
-    infile.close()
     return(answers)
 
 
-def read_answers_no_ip(quiz_id, nbr_of_questions, participant_id):
-    answers = { str(i):"" for i in range(1,int(nbr_of_questions)+1) }
-    infile = open(DATA_DIR+quiz_id+"/"+participant_id, "r")
-    csvreader = csv.reader(infile)
-    for row in csvreader:
+@instrumented
+def read_answers_no_ip(quiz_id, nbr_of_questions, participant_id, question_range=None):
+    answers = { key:"" for key in make_question_keys(nbr_of_questions, question_range) }
+    if get_storage_mode(quiz_id) == SQLITE_STORAGE:
+        question_nbrs = None if question_range == None else list(answers)
+        for question_nbr, answer in sqlite_log.read_answers(DATABASE_FILE, quiz_id, participant_id, question_nbrs=question_nbrs):
+            answers[question_nbr] = answer.strip()
+        return(answers)
+    rows, offset = read_log_rows(quiz_id, get_log_file_name(quiz_id, participant_id), events=[ANSWER])
+    for row in rows:
         try:
-            if row[1] == ANSWER and str(row[2]) == quiz_id and str(row[4]) == participant_id:
+            if row[1] == ANSWER and str(row[2]) == quiz_id and str(row[4]) == participant_id and (question_range == None or str(row[5]) in answers):
                 answers[str(row[5])] = str(row[6]).strip()
         except Exception:
             pass
-    infile.close()
     return(answers)
 
 
-def make_check_counts(checks, nbr_of_questions):
-    check_counts = { str(i):"0/0" for i in range(1,int(nbr_of_questions)+1) }
-    for participant_id in checks:
-        for question_id in checks[participant_id]:
-            if checks[participant_id][question_id] != "":
-                correct, count = check_counts[question_id].split("/")
-                count = str(int(count)+1)
-                if checks[participant_id][question_id] == "correct":
-                    correct = str(int(correct)+1)
-                check_counts[question_id] = "/".join([correct, count])
+def update_question_counts(question_counts, question_nbr, check, change):
+    if question_nbr not in question_counts:
+        question_counts[question_nbr] = { "correct": 0, "checked": 0 }
+    if check != "":
+        question_counts[question_nbr]["checked"] += change
+    if check == "correct":
+        question_counts[question_nbr]["correct"] += change
+
+
+def make_question_counts(results):
+    question_counts = {}
+    for participant in results:
+        for question_nbr, check in results[participant]["checks"].items():
+            update_question_counts(question_counts, question_nbr, check.strip(), 1)
+    return(question_counts)
+
+
+def make_check_counts(question_counts, nbr_of_questions, question_range=None):
+    check_counts = { key:"0/0" for key in make_question_keys(nbr_of_questions, question_range) }
+    for question_nbr in question_counts:
+        if question_nbr in check_counts:
+            check_counts[question_nbr] = "{0}/{1}".format(question_counts[question_nbr]["correct"], question_counts[question_nbr]["checked"])
     return(check_counts)
 
 
-def read_checks(quiz_id, nbr_of_questions, participant_id_check):
-    checks_participant_empty = { str(i):"" for i in range(1,int(nbr_of_questions)+1) }
-    checks = { participant_id_check: dict(checks_participant_empty) }
-    for file_name in os.listdir(DATA_DIR+quiz_id):
-        if re.search("^[0-9]+$", file_name):
-            infile = open(DATA_DIR+quiz_id+"/"+file_name, "r")
-            csvreader = csv.reader(infile)
-            for row in csvreader:
-                try:
-                    if row[1] == CHECK and str(row[2]) == quiz_id:
-                        participant_id = str(row[3])
-                        question_id = str(row[5])
-                        check_status = str(row[6]).strip()
-                        if participant_id not in checks:
-                            checks[participant_id] = dict(checks_participant_empty)
-                        checks[participant_id][question_id] = check_status
-                except Exception:
-                    pass
-            infile.close()
-    check_counts = make_check_counts(checks, nbr_of_questions)
-    return(checks[participant_id_check], check_counts)
+@instrumented
+def read_checks(quiz_id, nbr_of_questions, participant_id_check, question_range=None):
+    # the counts come from the question counts which the quiz state keeps up to date
+    request_cache = get_request_cache()
+    cache_key = ("checks", quiz_id, nbr_of_questions, participant_id_check, question_range)
+    if cache_key not in request_cache:
+        checks = { key:"" for key in make_question_keys(nbr_of_questions, question_range) }
+        quiz_state = get_quiz_state(quiz_id)
+        with quiz_state["lock"]:
+            update_quiz_state(quiz_id, quiz_state)
+            if participant_id_check in quiz_state["results"]:
+                participant_checks = quiz_state["results"][participant_id_check]["checks"]
+                if question_range == None:
+                    checks.update(participant_checks)
+                else:
+                    checks.update({ key: participant_checks[key] for key in checks if key in participant_checks })
+            check_counts = make_check_counts(quiz_state["question_counts"], nbr_of_questions, question_range)
+        request_cache[cache_key] = (checks, check_counts)
+    checks, check_counts = request_cache[cache_key]
+    return(dict(checks), check_counts)
 
 
-def read_results_from_logfile(quiz_id):
+def make_quiz_state():
+    return({ "lock": threading.Lock(), "offsets": {}, "quiz_name": "", "quiz_date": "", "results": {}, "checkers": {}, "question_counts": {}, "answer_index": {}, "answer_groups": None })
+
+
+def get_quiz_state(quiz_id):
+    with quiz_states_lock:
+        if quiz_id not in quiz_states:
+            quiz_states[quiz_id] = make_quiz_state()
+        return(quiz_states[quiz_id])
+
+
+def add_logfile_row_to_quiz_state(quiz_state, row):
+    if row[1] == START_QUIZ:
+        quiz_state["quiz_name"] = row[3]
+        quiz_state["quiz_date"] = row[0][:8]
+
+
+def normalize_answer(answer):
+    return(" ".join(answer.lower().split()))
+
+
+def update_answer_index(answer_index, question_nbr, answer, participant_id, change):
+    if question_nbr not in answer_index:
+        answer_index[question_nbr] = {}
+    answer_groups = answer_index[question_nbr]
+    normalized_answer = normalize_answer(answer)
+    if change > 0:
+        if normalized_answer not in answer_groups:
+            answer_groups[normalized_answer] = set()
+        answer_groups[normalized_answer].add(participant_id)
+    elif normalized_answer in answer_groups:
+        answer_groups[normalized_answer].discard(participant_id)
+        if len(answer_groups[normalized_answer]) == 0:
+            del answer_groups[normalized_answer]
+
+
+def add_participant_row_to_quiz_state(quiz_state, row):
+    results = quiz_state["results"]
+    if row[1] == PARTICIPANT:
+        participant_id = str(row[4])
+        participant_name = str(row[5])
+        if participant_id in results:
+            results[participant_id]["participant_name"] = participant_name
+        else:
+            results[participant_id] = participant_record.ParticipantRecord(participant_id, participant_name)
+    elif row[1] == ANSWER and str(row[4]) in results:
+        question_nbr = str(row[5])
+        answer = str(row[6]).strip()
+        previous_answer = results[str(row[4])].answers.replace(question_nbr, answer)
+        if previous_answer != None:
+            update_answer_index(quiz_state["answer_index"], question_nbr, previous_answer, str(row[4]), -1)
+        update_answer_index(quiz_state["answer_index"], question_nbr, answer, str(row[4]), 1)
+    elif row[1] == CHECK and str(row[3]) in results:
+        question_nbr = str(row[5])
+        check = str(row[6]).strip()
+        previous_check = results[str(row[3])].checks.replace(question_nbr, check)
+        if previous_check != None:
+            update_question_counts(quiz_state["question_counts"], question_nbr, previous_check, -1)
+        update_question_counts(quiz_state["question_counts"], question_nbr, check, 1)
+    elif row[1] == STATUS and str(row[4]) in results:
+        result = results[str(row[4])]
+        status = row[5]
+        result["status"] = status
+        if status == STARTED:
+            result.started_time = row[0]
+        if status == FINISHED:
+            result.finished_time = row[0]
+            if result.started_time != "":
+                time_diff = datetime.datetime.strptime(result.finished_time, DATE_FORMAT) - datetime.datetime.strptime(result.started_time, DATE_FORMAT)
+                hours, minutes, seconds = str(time_diff).split(":")
+                minutes = int(minutes) + 60*int(hours)
+                result.status_time = " ({0}:{1})".format(minutes, seconds)
+    elif row[1] == CHECKER:
+        quiz_state["checkers"][str(row[3])] = str(row[4])
+
+
+def update_quiz_state(quiz_id, quiz_state):
+    file_sizes = get_log_file_sizes(quiz_id)
+    # a log file which shrank was rewritten: start again from scratch
+    if [ file_name for file_name in quiz_state["offsets"] if file_sizes.get(file_name, 0) < quiz_state["offsets"][file_name] ]:
+        lock = quiz_state["lock"]
+        quiz_state.clear()
+        quiz_state.update(make_quiz_state())
+        quiz_state["lock"] = lock
+    # the files are read at the same time, but applied in a fixed order:
+    # rows of different files on the same answer or check replace each other
+    file_names = [ file_name for file_name in sorted(file_sizes, reverse=True) if file_sizes[file_name] > quiz_state["offsets"].get(file_name, 0) ]
+    file_offsets = [ (file_name, quiz_state["offsets"].get(file_name, 0)) for file_name in file_names ]
+    file_rows = read_log_files(quiz_id, file_offsets, sum([ file_sizes[file_name]-offset for file_name, offset in file_offsets ]))
+    for file_name, (rows, offset) in zip(file_names, file_rows):
+        quiz_state["offsets"][file_name] = offset
+        if len(rows) > 0:
+            quiz_state["answer_groups"] = None
+        for row in rows:
+            if str(row[2]) != quiz_id:
+                continue
+            if file_name == get_log_file_name(quiz_id):
+                add_logfile_row_to_quiz_state(quiz_state, row)
+            else:
+                add_participant_row_to_quiz_state(quiz_state, row)
+
+
+def make_quiz_state_snapshot(quiz_state):
     results = {}
-    quiz_name = ""
-    quiz_date = ""
-    infile = open(DATA_DIR+quiz_id+"/"+LOG_FILE, "r")
-    csvreader = csv.reader(infile)
-    rows = []
-    for row in csvreader:
-        if str(row[2]) == quiz_id:
-           rows.append(row)
-    infile.close()
-    for row in rows:
-        if row[1] == START_QUIZ:
-            quiz_name = row[3]
-            quiz_date = row[0][:8]
-    checkers = {}
-    for file_name in sorted(os.listdir(DATA_DIR+quiz_id), reverse=True):
-        if re.search("^[0-9]+$", file_name):
-            infile = open(DATA_DIR+quiz_id+"/"+file_name, "r")
-            csvreader = csv.reader(infile)
-            rows = []
-            for row in csvreader:
-                if str(row[2]) == quiz_id:
-                   rows.append(row)
-            infile.close()
-            for row in rows:
-                if row[1] == PARTICIPANT:
-                    participant_id = str(row[4])
-                    participant_name = str(row[5])
-                    key = " ".join([participant_id])
-                    if key in results:
-                        results[key]["participant_name"] = participant_name
-                    else:
-                        results[key] = { "checks": {}, "answers": {}, "status": "", "participant_name": participant_name, "participant_id": participant_id, "time": { STARTED: "", FINISHED: "" }  }
-                elif row[1] == ANSWER:
-                    participant_id = str(row[4])
-                    question_nbr = str(row[5])
-                    answer = str(row[6]).strip()
-                    key = " ".join([participant_id])
-                    results[key]["answers"][question_nbr] = answer
-                elif row[1] == CHECK:
-                    participant_id_check = str(row[3])
-                    question_nbr = str(row[5])
-                    check = str(row[6]).strip()
-                    key = " ".join([participant_id_check])
-                    results[key]["checks"][question_nbr] = check
-                elif row[1] == STATUS:
-                    participant_id = str(row[4])
-                    key = " ".join([participant_id])
-                    status = row[5]
-                    results[key]["status"] = status
-                    if status == STARTED:
-                        results[key]["time"][STARTED] = row[0]
-                    if status == FINISHED:
-                        results[key]["time"][FINISHED] = row[0]
-                        time_diff = datetime.datetime.strptime(results[key]["time"][FINISHED], DATE_FORMAT) - datetime.datetime.strptime(results[key]["time"][STARTED], DATE_FORMAT)
-                        hours, minutes, seconds = str(time_diff).split(":")
-                        minutes = int(minutes) + 60*int(hours)
-                        results[key]["status"] += " ({0}:{1})".format(minutes, seconds)
-                elif row[1] == CHECKER:
-                    checker = str(row[3])
-                    checkee = str(row[4])
-                    checkers[checker] = checkee
-    for checker in checkers:
-        checkee = checkers[checker]
-        results[checkee]["checker"] = results[checker]["participant_name"]
+    for key in sorted(quiz_state["results"], reverse=True):
+        results[key] = quiz_state["results"][key].copy()
+    for checker in quiz_state["checkers"]:
+        checkee = quiz_state["checkers"][checker]
+        if checker in results and checkee in results:
+            results[checkee]["checker"] = results[checker]["participant_name"]
+    question_counts = { question_nbr: dict(quiz_state["question_counts"][question_nbr]) for question_nbr in quiz_state["question_counts"] }
+    return(quiz_state["quiz_name"], quiz_state["quiz_date"], results, question_counts)
+
+
+def make_answer_groups(quiz_state, nbr_of_questions):
+    results = quiz_state["results"]
+    checker_names = {}
+    for checker in quiz_state["checkers"]:
+        if checker in results:
+            checker_names[quiz_state["checkers"][checker]] = results[checker]["participant_name"]
+    # participants who gave some answers are listed with an empty answer for the others
+    answering_ids = [ key for key in results if len(results[key]["answers"]) > 0 ]
+    answer_groups = []
+    for i in range(1, int(nbr_of_questions)+1):
+        question_nbr = str(i)
+        answer_index = quiz_state["answer_index"].get(question_nbr, {})
+        group_members = { normalized_answer: list(answer_index[normalized_answer]) for normalized_answer in answer_index }
+        unanswered_ids = [ key for key in answering_ids if question_nbr not in results[key]["answers"] ]
+        if len(unanswered_ids) > 0:
+            group_members[""] = group_members.get("", [])+unanswered_ids
+        question_groups = []
+        for normalized_answer in sorted(group_members):
+            members = []
+            for key in sorted(group_members[normalized_answer], key=lambda key: (results[key]["participant_name"].lower(), key)):
+                members.append({ "participant_id": key,
+                                 "participant_name": results[key]["participant_name"],
+                                 "answer": results[key]["answers"].get(question_nbr, ""),
+                                 "check": results[key]["checks"].get(question_nbr, ""),
+                                 "checker": checker_names.get(key, "") })
+            question_groups.append({ "normalized_answer": normalized_answer,
+                                     "count": len(members),
+                                     "correct": len([ member for member in members if member["check"] == "correct" ]),
+                                     "members": members })
+        answer_groups.append(question_groups)
+    return(answer_groups)
+
+
+def read_answer_groups(quiz_id, nbr_of_questions):
+    # the groups are rebuilt only after new rows: host reloads are cheap
+    quiz_state = get_quiz_state(quiz_id)
+    with quiz_state["lock"]:
+        update_quiz_state(quiz_id, quiz_state)
+        if quiz_state["answer_groups"] == None or quiz_state["answer_groups"][0] != nbr_of_questions:
+            quiz_state["answer_groups"] = (nbr_of_questions, make_answer_groups(quiz_state, nbr_of_questions))
+        return(quiz_state["answer_groups"][1])
+
+
+def write_checks(quiz_id, checker_id, checks):
+    # only changed checks are written, with one append per checked participant
+    check_rows = {}
+    quiz_state = get_quiz_state(quiz_id)
+    with quiz_state["lock"]:
+        update_quiz_state(quiz_id, quiz_state)
+        results = quiz_state["results"]
+        for checkee_id, question_nbr, check in checks:
+            if checkee_id in results and results[checkee_id]["checks"].get(question_nbr, "") != check:
+                if checkee_id not in check_rows:
+                    check_rows[checkee_id] = []
+                check_rows[checkee_id].append([CHECK, quiz_id, checkee_id, checker_id, question_nbr, check])
+    for checkee_id in check_rows:
+        write_log_rows(check_rows[checkee_id], quiz_id, participant_id=checkee_id)
+    return(sum([ len(check_rows[checkee_id]) for checkee_id in check_rows ]))
+
+
+def find_answer_group(quiz_id, nbr_of_questions, question_nbr, normalized_answer):
+    for question_group in read_answer_groups(quiz_id, nbr_of_questions)[int(question_nbr)-1]:
+        if question_group["normalized_answer"] == normalized_answer:
+            return(question_group)
+    return({ "members": [] })
+
+
+def is_valid_check(nbr_of_questions, question_nbr, check):
+    return(re.search("^[0-9]+$", question_nbr) and int(question_nbr) >= 1 and int(question_nbr) <= int(nbr_of_questions) and check in CHECK_VALUES)
+
+
+def read_quiz_state_snapshot(quiz_id):
+    quiz_state = get_quiz_state(quiz_id)
+    with quiz_state["lock"]:
+        update_quiz_state(quiz_id, quiz_state)
+        return(make_quiz_state_snapshot(quiz_state))
+
+
+@instrumented
+def read_results_from_logfile(quiz_id):
+    quiz_name, quiz_date, results, question_counts = read_quiz_state_snapshot(quiz_id)
     return(quiz_name, quiz_date, results)
 
 
@@ -266,22 +741,23 @@ def sort_results_list(results_list):
 def add_answers_given_to_results(results):
     for participant in results:
         answers_given = 0
-        for question_nbr in results[participant]["answers"]:
-            if results[participant]["answers"][question_nbr].strip() != "":
+        for question_nbr, answer in results[participant]["answers"].items():
+            if answer.strip() != "":
                 answers_given += 1
         results[participant]["answers_given"] = answers_given
     return(results)
 
 
-def add_solos_to_results(results):
+def add_solos_to_results(results, question_counts=None):
+    if question_counts == None:
+        question_counts = make_question_counts(results)
     for participant in results:
         correct_answers = 0
         solos = []
-        for question_nbr in results[participant]["checks"]:
-            if results[participant]["checks"][question_nbr].strip() == "correct":
+        for question_nbr, check in results[participant]["checks"].items():
+            if check.strip() == "correct":
                 correct_answers += 1
-                global_correct_answers = [ p for p in results if question_nbr in results[p]["checks"] and results[p]["checks"][question_nbr].strip() == "correct" ]
-                if len(global_correct_answers) == 1: solos.append(question_nbr)
+                if question_counts[question_nbr]["correct"] == 1: solos.append(question_nbr)
         results[participant]["correct_answers"] = correct_answers
         results[participant]["answers_checked"] = len(results[participant]["checks"])
         results[participant]["solos"] = solos
@@ -294,40 +770,229 @@ def add_split_results_to_results(results, nbr_of_questions):
             results[participant]["comment"] = ""
         else:
             split_results = [ 0, 0, 0, 0 ]
-            for question_nbr in results[participant]["checks"]:
-                if results[participant]["checks"][question_nbr].strip() == "correct":
+            for question_nbr, check in results[participant]["checks"].items():
+                if check.strip() == "correct":
                     section_id = int((int(question_nbr) - 1) / 30)
                     split_results[section_id] += 1 
             results[participant]["comment"] = " ".join([ QUESTION_PREFIXES[i] + ":" + str(split_results[i]) + ";"  for i in range(0, len(split_results)) ])
     return results
 
 
-def read_results(quiz_id, error_text=""):
+def make_verdict_matrix(results, participant_ids, nbr_of_questions):
+    # participants x questions, from the verdict codes and answered flags of
+    # the participant records; None for answers or checks outside the quiz
+    if [ key for key in participant_ids if results[key].has_question_extras() ]:
+        return(None)
+    nbr_of_columns = int(nbr_of_questions)
+    matrices = []
+    for cells in ([ results[key].checks.verdicts for key in participant_ids ], [ results[key].answers.answered for key in participant_ids ]):
+        rows = []
+        for row in cells:
+            if row[nbr_of_columns:].strip(b"\0") != b"":
+                return(None)
+            rows.append(bytes(row[:nbr_of_columns]).ljust(nbr_of_columns, b"\0"))
+        matrices.append(numpy.frombuffer(b"".join(rows), dtype=numpy.uint8).reshape(len(participant_ids), nbr_of_columns))
+    return(matrices[0], matrices[1] != 0)
+
+
+def add_scores_to_results(results, nbr_of_questions, question_counts, matrices=None):
+    # returns the participant ids in ranking order with the verdict matrix
+    # in the same order, or None for the matrix when there are no matrices
+    participant_ids = list(results)
+    if matrices == None:
+        results = add_answers_given_to_results(results)
+        results = add_solos_to_results(results, question_counts)
+        results = add_split_results_to_results(results, nbr_of_questions)
+        return([ result["participant_id"] for result in sort_results_list(results.values()) ], None)
+    verdicts, answered = matrices
+    correct = verdicts == participant_record.VERDICT_CORRECT
+    correct_answers = correct.sum(axis=1)
+    answers_checked = (verdicts != participant_record.VERDICT_UNCHECKED).sum(axis=1)
+    answers_given = answered.sum(axis=1)
+    solo_matrix = correct & (correct.sum(axis=0) == 1)
+    nbr_of_solos = solo_matrix.sum(axis=1)
+    split_results = None
+    if int(nbr_of_questions) == 120:
+        split_results = correct.reshape(len(participant_ids), len(QUESTION_PREFIXES), 30).sum(axis=2).tolist()
+    question_columns = [ str(i) for i in range(1, int(nbr_of_questions)+1) ]
+    for row, key in enumerate(participant_ids):
+        result = results[key]
+        result["answers_given"] = int(answers_given[row])
+        result["correct_answers"] = int(correct_answers[row])
+        result["answers_checked"] = int(answers_checked[row])
+        solo_set = set()
+        if nbr_of_solos[row] > 0:
+            solo_set = { question_columns[column] for column in numpy.flatnonzero(solo_matrix[row]) }
+        # in question order, as the checks iterate, like add_solos_to_results
+        result["solos"] = [ question_nbr for question_nbr in result["checks"] if question_nbr in solo_set ]
+        if split_results == None:
+            result["comment"] = ""
+        else:
+            result["comment"] = " ".join([ QUESTION_PREFIXES[i] + ":" + str(split_results[row][i]) + ";" for i in range(0, len(QUESTION_PREFIXES)) ])
+    # stable, like sorted: equal names keep their positions
+    name_ranks = numpy.empty(len(participant_ids), dtype=numpy.int64)
+    name_ranks[sorted(range(0, len(participant_ids)), key=lambda row: results[participant_ids[row]]["participant_name"])] = numpy.arange(len(participant_ids))
+    order = numpy.lexsort((name_ranks, -answers_given, -nbr_of_solos, answers_checked, -correct_answers))
+    return([ participant_ids[row] for row in order.tolist() ], verdicts[order])
+
+
+def read_scored_results(quiz_id):
     quiz_name, nbr_of_questions, error_text = get_quiz_details(quiz_id)
-    quiz_name, quiz_date, results = read_results_from_logfile(quiz_id)
-    results = add_answers_given_to_results(results)
-    results = add_solos_to_results(results)
-    results = add_split_results_to_results(results, nbr_of_questions)
-    results_list = []
+    quiz_name, quiz_date, results, question_counts = read_quiz_state_snapshot(quiz_id)
+    matrices = None
+    if len(results) > 0 and load_numpy(len(results)*int(nbr_of_questions)) != None:
+        matrices = make_verdict_matrix(results, list(results), nbr_of_questions)
     for key in results:
         results[key]["participant_id"] = key
-        results_list.append(results[key])
-    results_dict = { result["participant_id"]:result for result in sorted(results_list, key=lambda result:(-result["correct_answers"], 
-                                                                                                           result["answers_checked"], 
-                                                                                                           -len(result["solos"]), 
-                                                                                                           -result["answers_given"], 
-                                                                                                           result["participant_name"])) }
+    ranked_ids, verdicts = add_scores_to_results(results, nbr_of_questions, question_counts, matrices)
+    results_dict = {}
+    for key in ranked_ids:
+        results[key]["scoreboard_key"] = make_scoreboard_key(quiz_id, key)
+        results_dict[key] = results[key]
+    return(quiz_name, quiz_date, results_dict, ranked_ids, verdicts, error_text)
+
+
+@instrumented
+def read_results(quiz_id, error_text=""):
+    quiz_name, quiz_date, results_dict, ranked_ids, verdicts, error_text = read_scored_results(quiz_id)
     return(quiz_name, quiz_date, results_dict, error_text)
 
 
+def render_result_table(quiz_id, participant_name, participant_id, check_url="", template_name=RESULT_TABLE):
+    global result_tables_size
+    # the table only differs per viewer in the highlighted row and, for
+    # the quiz host, in the check buttons
+    key = (template_name, quiz_id, get_quiz_version(quiz_id), participant_name, check_url, participant_id if check_url != "" else "")
+    with result_tables_lock:
+        if key in result_tables:
+            result_tables.move_to_end(key)
+            return(Markup(result_tables[key]))
+    quiz_name, quiz_date, results, error_text = read_results(quiz_id)
+    result_table = render_template(template_name+HTML_SUFFIX, results=sort_results_list(results.values()), participant_name=participant_name, participant_id=participant_id, quiz_id=quiz_id, check_url=check_url)
+    with result_tables_lock:
+        if key not in result_tables and len(result_table) <= RESULT_TABLE_CACHE_SIZE:
+            result_tables[key] = result_table
+            result_tables_size += len(result_table)
+            while result_tables_size > RESULT_TABLE_CACHE_SIZE:
+                old_key, old_result_table = result_tables.popitem(last=False)
+                result_tables_size -= len(old_result_table)
+    return(Markup(result_table))
+
+
+def get_quiz_version(quiz_id):
+    log_file_sizes = get_log_file_sizes(quiz_id)
+    version = ",".join([ "{0}:{1}".format(file_name, log_file_sizes[file_name]) for file_name in sorted(log_file_sizes) ])
+    return(hashlib.sha1(version.encode("utf-8")).hexdigest()[:16])
+
+
+def make_scoreboard_key(quiz_id, participant_id):
+    # participant ids identify players, so viewers get a derived key instead
+    secret_key = str(get_secret_key()).encode("utf-8")
+    return(hmac.new(secret_key, (quiz_id+":"+participant_id).encode("utf-8"), hashlib.sha1).hexdigest()[:12])
+
+
+def make_scoreboard(quiz_id):
+    quiz_name, quiz_date, results, error_text = read_results(quiz_id)
+    entries = []
+    summary = { "joined": 0, WAITING: 0, STARTED: 0, FINISHED: 0, "checked": 0 }
+    for result in sort_results_list(results.values()):
+        entries.append({ "key": result["scoreboard_key"],
+                         "participant_name": result["participant_name"],
+                         "status": result["status"],
+                         "correct_answers": result["correct_answers"],
+                         "solos": len(result["solos"]),
+                         "answers_given": result["answers_given"],
+                         "answers_checked": result["answers_checked"],
+                         "checker": result.get("checker", ""),
+                         "comment": result["comment"] })
+        summary["joined"] += 1
+        if re.search("^"+WAITING, result["status"]):
+            summary[WAITING] += 1
+        elif re.search("^"+STARTED, result["status"]):
+            summary[STARTED] += 1
+        else:
+            summary[FINISHED] += 1
+        if result["answers_checked"] > 0:
+            summary["checked"] += 1
+    return(quiz_name, quiz_date, entries, summary)
+
+
+def get_scoreboard(quiz_id):
+    with scoreboards_lock:
+        if quiz_id not in scoreboards:
+            scoreboards[quiz_id] = { "lock": threading.Lock(), "version": "", "checked": 0.0, "entries": [], "summary": {} }
+        scoreboard = scoreboards[quiz_id]
+    # all viewers of a quiz in this process share one check per interval
+    with scoreboard["lock"]:
+        if time.time()-scoreboard["checked"] >= SCOREBOARD_POLL_INTERVAL:
+            version = get_quiz_version(quiz_id)
+            if version != scoreboard["version"]:
+                quiz_name, quiz_date, scoreboard["entries"], scoreboard["summary"] = make_scoreboard(quiz_id)
+                scoreboard["version"] = version
+            scoreboard["checked"] = time.time()
+        return(scoreboard["version"], scoreboard["entries"], scoreboard["summary"])
+
+
+def make_scoreboard_delta(version, entries, summary, sent_entries, sent_order):
+    order = [ entry["key"] for entry in entries ]
+    delta = { "version": version, "summary": summary, "changed": [ entry for entry in entries if sent_entries.get(entry["key"]) != entry ] }
+    if order != sent_order:
+        delta["order"] = order
+        delta["removed"] = [ key for key in sent_order if key not in order ]
+    return(delta)
+
+
+def make_scoreboard_stream():
+    return({ "version": "", "entries": {}, "order": [], "sent": time.time() })
+
+
+def make_scoreboard_event(quiz_id, scoreboard_stream):
+    # the next event of a stream, or "" when there is nothing to send yet
+    version, entries, summary = get_scoreboard(quiz_id)
+    if version != scoreboard_stream["version"]:
+        delta = make_scoreboard_delta(version, entries, summary, scoreboard_stream["entries"], scoreboard_stream["order"])
+        scoreboard_stream.update({ "version": version, "entries": { entry["key"]: entry for entry in entries }, "order": [ entry["key"] for entry in entries ], "sent": time.time() })
+        return("event: scoreboard\ndata: {0}\n\n".format(json.dumps(delta)))
+    if time.time()-scoreboard_stream["sent"] >= SCOREBOARD_KEEP_ALIVE:
+        scoreboard_stream["sent"] = time.time()
+        return(": keep-alive\n\n")
+    return("")
+
+
+def scoreboard_event_stream(quiz_id):
+    scoreboard_stream = make_scoreboard_stream()
+    start_time = time.time()
+    yield("retry: 5000\n\n")
+    while time.time()-start_time < SCOREBOARD_STREAM_DURATION:
+        event = make_scoreboard_event(quiz_id, scoreboard_stream)
+        if event != "":
+            yield(event)
+        time.sleep(SCOREBOARD_POLL_INTERVAL)
+
+
+def get_scoreboard_events_url():
+    # pages only open the stream when a long-running server serves it
+    if not LIVE_UPDATES:
+        return("")
+    return(BASE_URL+SCOREBOARD_EVENTS)
+
+
+def check_quiz_id(quiz_id):
+    if not re.search("^[0-9]+$", quiz_id) or not os.path.isdir(DATA_DIR+quiz_id):
+        return("unknown quiz")
+    quiz_name, nbr_of_questions, error_text = get_quiz_details(quiz_id)
+    return(error_text)
+
+
+@instrumented
 def read_status(quiz_id, ip_address, participant_id):
+    if get_storage_mode(quiz_id) == SQLITE_STORAGE:
+        return(sqlite_log.read_status(DATABASE_FILE, quiz_id, participant_id, ip_address))
     status = ""
-    infile = open(DATA_DIR+quiz_id+"/"+participant_id, "r")
-    csvreader = csv.reader(infile)
-    for row in csvreader:
+    rows, offset = read_log_rows(quiz_id, get_log_file_name(quiz_id, participant_id), events=[STATUS])
+    for row in rows:
         if row[1] == STATUS and str(row[2]) == quiz_id and row[3] == ip_address and str(row[4]) == participant_id:
             status = row[5]
-    infile.close()
     return(status)
 
 
@@ -339,7 +1004,7 @@ def find_max_len_check_counts(check_counts):
     return(max_len_check_counts)
 
 
-def make_quiz_result_text(quiz_id, participant_id):
+def make_quiz_result_lines(quiz_id, participant_id):
     quiz_name, nbr_of_questions, error_text = get_quiz_details(quiz_id)
     if len(error_text) > 0:
         raise ValueError(error_text)
@@ -348,122 +1013,261 @@ def make_quiz_result_text(quiz_id, participant_id):
     quiz_name, quiz_date, results, error_text = read_results(quiz_id)
     results_list = sort_results_list(results.values())
     rank = [i+1 for i in range(0,len(results_list)) if results_list[i]["participant_id"] == participant_id][0]
-    text = "{0} (date: {1}; {2} participants; {3} questions)\n\n".format(quiz_name, quiz_date, len(results), nbr_of_questions)
-    text += "Name:  {0}\n".format(participant_name)
-    text += "Rank:  {0}\n".format(rank)
-    text += "Score: {0}\n".format(results[participant_id]['correct_answers'])
-    text += "Solos: {0}\n\n".format(len(results[participant_id]['solos']))
-    max_len_question_id = 1+int(log(int(nbr_of_questions), 10))
-    max_len_check_counts = find_max_len_check_counts(check_counts)
-    for i in range(1,int(nbr_of_questions)+1):
-        question_nbr = str(i)
-        if len(results[participant_id]["solos"]) > 0:
-            if question_nbr in results[participant_id]["solos"]: text += "SOLO "
-            else: text += "     "
-        text += "{0} ".format(check_counts[question_nbr].rjust(max_len_check_counts))
-        if not question_nbr in results[participant_id]["checks"]: check = "?"
-        elif results[participant_id]["checks"][question_nbr] == "correct": check = "+"
-        elif results[participant_id]["checks"][question_nbr] == "wrong": check = "-"
-        else: check = "?"
-        text += "{0} {1}. ".format(check, str(i).rjust(max_len_question_id))
-        if question_nbr in results[participant_id]["answers"]:
-            text += results[participant_id]["answers"][question_nbr]
-        text += "\n"
+    result = results[participant_id]
     filename = re.sub(" ","_",quiz_name.lower())
-    return(text, filename)
+    def generate_lines():
+        yield("{0} (date: {1}; {2} participants; {3} questions)\n\n".format(quiz_name, quiz_date, len(results), nbr_of_questions))
+        yield("Name:  {0}\n".format(participant_name))
+        yield("Rank:  {0}\n".format(rank))
+        yield("Score: {0}\n".format(result['correct_answers']))
+        yield("Solos: {0}\n\n".format(len(result['solos'])))
+        max_len_question_id = 1+int(log(int(nbr_of_questions), 10))
+        max_len_check_counts = find_max_len_check_counts(check_counts)
+        for i in range(1,int(nbr_of_questions)+1):
+            question_nbr = str(i)
+            line = []
+            if len(result["solos"]) > 0:
+                if question_nbr in result["solos"]: line.append("SOLO ")
+                else: line.append("     ")
+            line.append("{0} ".format(check_counts[question_nbr].rjust(max_len_check_counts)))
+            if not question_nbr in result["checks"]: check = "?"
+            elif result["checks"][question_nbr] == "correct": check = "+"
+            elif result["checks"][question_nbr] == "wrong": check = "-"
+            else: check = "?"
+            line.append("{0} {1}. ".format(check, str(i).rjust(max_len_question_id)))
+            if question_nbr in result["answers"]:
+                line.append(result["answers"][question_nbr])
+            line.append("\n")
+            yield("".join(line))
+    return(generate_lines(), filename)
 
 
-def make_quiz_result_text_all(quiz_id):
+def make_quiz_result_text(quiz_id, participant_id):
+    lines, filename = make_quiz_result_lines(quiz_id, participant_id)
+    return("".join(lines), filename)
+
+
+def make_quiz_result_rows_all(quiz_id):
     quiz_name, nbr_of_questions, error_text = get_quiz_details(quiz_id)
     if len(error_text) > 0:
         raise ValueError(error_text)
-    quiz_name, quiz_date, results, error_text = read_results(quiz_id)
-    results_list = sort_results_list(results.values())
-    results_table = [["Name"]]
-    for i in range(0, len(results_list)):
-        results_table[-1].append(re.sub(",", "_", results_list[i]["participant_name"]))
-    results_table.append(["Scores"])
-    for i in range(0, len(results_list)):
-        results_table[-1].append(str(results_list[i]["correct_answers"]))
-    for i in range(1,int(nbr_of_questions)+1):
-        question_nbr = str(i)
-        results_table.append([question_nbr])
-        for i in range(0, len(results_list)):
-            if not question_nbr in results_list[i]["checks"]:
-                results_table[-1].append("")
-            elif results_list[i]["checks"][question_nbr] == "correct":
-                results_table[-1].append("1")
-            elif results_list[i]["checks"][question_nbr] == "wrong":
-                results_table[-1].append("0")
-    text = ""
-    for row in results_table:
-        text += ",".join(row) + "\n"
+    quiz_name, quiz_date, results, ranked_ids, verdicts, error_text = read_scored_results(quiz_id)
+    # the columns follow the ranking, which is also the row order of the verdict matrix
+    results_list = [ results[key] for key in ranked_ids ]
     filename = re.sub(" ","_",quiz_name.lower()) + "_all"
-    return(text, filename)
+    def generate_rows():
+        yield(["Name"]+[ re.sub(",", "_", result["participant_name"]) for result in results_list ])
+        yield(["Scores"]+[ str(result["correct_answers"]) for result in results_list ])
+        # checks which are not correct or wrong have no cell
+        cells = { participant_record.VERDICT_UNCHECKED: [ "" ], participant_record.VERDICT_WRONG: [ "0" ], participant_record.VERDICT_CORRECT: [ "1" ], participant_record.VERDICT_OTHER: [] }
+        if verdicts is not None:
+            for i in range(1,int(nbr_of_questions)+1):
+                row = [str(i)]
+                for verdict in verdicts[:, i-1].tolist():
+                    row += cells[verdict]
+                yield(row)
+            return
+        verdict_rows = [ result.checks.verdicts for result in results_list ]
+        for i in range(1,int(nbr_of_questions)+1):
+            row = [str(i)]
+            for verdict_row in verdict_rows:
+                row += cells[verdict_row[i-1]] if i <= len(verdict_row) else cells[participant_record.VERDICT_UNCHECKED]
+            yield(row)
+    return(generate_rows(), filename)
+
+
+def generate_csv_lines(rows):
+    # one small buffer is reused, so memory does not grow with the table
+    data = io.StringIO()
+    csvwriter = csv.writer(data, lineterminator="\n")
+    for row in rows:
+        csvwriter.writerow(row)
+        yield(data.getvalue())
+        data.seek(0)
+        data.truncate()
 
 
-def get_quiz_details(quiz_id):
-    quiz_name = ""
-    nbr_of_questions = ""
-    error_text = ""
-    infile = open(DATA_DIR+quiz_id+"/"+LOG_FILE, "r")
-    csvreader = csv.reader(infile)
-    for row in csvreader:
+def make_quiz_result_text_all(quiz_id):
+    rows, filename = make_quiz_result_rows_all(quiz_id)
+    return("".join(generate_csv_lines(rows)), filename)
+
+
+def get_request_cache():
+    if not has_request_context():
+        return({})
+    if "quiz_cache" not in g:
+        g.quiz_cache = {}
+    return(g.quiz_cache)
+
+
+def forget_request_cache(quiz_id):
+    request_cache = get_request_cache()
+    for key in [ key for key in request_cache if key[1] == quiz_id ]:
+        del request_cache[key]
+
+
+def read_log_quiz_details(quiz_id):
+    quiz_details = { "quiz_name": "", "nbr_of_questions": "", "participant_id_host": "", "ip_address_host": "", "answering_started": False }
+    if not log_file_exists(quiz_id):
+        return(quiz_details)
+    rows, offset = read_log_rows(quiz_id, get_log_file_name(quiz_id))
+    for row in rows:
         if row[1] == START_QUIZ and row[2] == quiz_id:
-            quiz_name = str(row[3])
-            nbr_of_questions = str(row[4])
+            quiz_details["quiz_name"] = str(row[3])
+            quiz_details["nbr_of_questions"] = str(row[4])
+            quiz_details["participant_id_host"] = row[5]
+            quiz_details["ip_address_host"] = row[6]
+        elif row[1] == ANSWER and row[2] == quiz_id:
+            quiz_details["answering_started"] = True
+        elif row[1] == STATUS and row[2] == quiz_id and row[5] == STARTED:
+            quiz_details["answering_started"] = True
+    return(quiz_details)
+
+
+def make_sections(nbr_of_questions):
+    if int(nbr_of_questions) != 120:
+        return([])
+    return([ { "prefix": QUESTION_PREFIXES[i], "first": 30*i+1, "last": 30*i+30 } for i in range(0, len(QUESTION_PREFIXES)) ])
+
+
+def make_manifest(quiz_details):
+    manifest = dict(quiz_details, format=MANIFEST_FORMAT)
+    manifest["sections"] = make_sections(quiz_details["nbr_of_questions"])
+    manifest["question_numbers"] = make_question_numbers(quiz_details["nbr_of_questions"])
+    return(manifest)
+
+
+def make_manifest_from_logs(quiz_id):
+    # for quizzes started before there were manifests
+    quiz_details = read_log_quiz_details(quiz_id)
+    if quiz_details["quiz_name"] == "" or quiz_details["nbr_of_questions"] == "":
+        return(None)
+    quiz_state = get_quiz_state(quiz_id)
+    with quiz_state["lock"]:
+        update_quiz_state(quiz_id, quiz_state)
+        quiz_details["checking_started"] = len(quiz_state["checkers"]) > 0
+    return(make_manifest(quiz_details))
+
+
+def write_manifest(quiz_id, manifest):
+    # write and rename, so readers never see half a manifest
+    file_name = DATA_DIR+quiz_id+"/"+MANIFEST_FILE
+    outfile = open(file_name+".tmp", "w")
+    json.dump(manifest, outfile)
+    outfile.close()
+    os.replace(file_name+".tmp", file_name)
+
+
+def update_manifest(quiz_id, changes):
+    # changes are made under a lock; log rows are written before, so a
+    # manifest made from the logs here already includes them
+    lock_file = open(DATA_DIR+quiz_id+"/"+MANIFEST_FILE+".lock", "a")
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    try:
+        manifest = read_manifest_file(quiz_id)
+        if manifest == None:
+            manifest = make_manifest_from_logs(quiz_id)
+        if manifest != None:
+            manifest.update(changes)
+            write_manifest(quiz_id, manifest)
+    finally:
+        lock_file.close()
+    return(manifest)
+
+
+def read_manifest_file(quiz_id):
+    file_name = DATA_DIR+quiz_id+"/"+MANIFEST_FILE
+    try:
+        file_stat = os.stat(file_name)
+    except (FileNotFoundError, NotADirectoryError):
+        return(None)
+    # the rename of a new manifest changes its inode as well as its time
+    version = (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size)
+    with manifests_lock:
+        if quiz_id in manifests and manifests[quiz_id][0] == version:
+            return(dict(manifests[quiz_id][1]))
+    infile = open(file_name, "r")
+    manifest = json.load(infile)
     infile.close()
+    if manifest.get("format") != MANIFEST_FORMAT:
+        return(None)
+    with manifests_lock:
+        manifests[quiz_id] = (version, manifest)
+    return(dict(manifest))
+
+
+def read_manifest(quiz_id):
+    manifest = read_manifest_file(quiz_id)
+    if manifest == None and re.search("^[0-9]+$", quiz_id) and os.path.isdir(DATA_DIR+quiz_id):
+        if not MANIFEST_WRITES:
+            return(make_manifest_from_logs(quiz_id))
+        try:
+            manifest = update_manifest(quiz_id, {})
+        except OSError:
+            manifest = make_manifest_from_logs(quiz_id)
+    return(manifest)
+
+
+def read_quiz_details(quiz_id):
+    request_cache = get_request_cache()
+    if ("quiz_details", quiz_id) in request_cache:
+        return(request_cache[("quiz_details", quiz_id)])
+    quiz_details = read_manifest(quiz_id)
+    if quiz_details == None:
+        quiz_details = { "quiz_name": "", "nbr_of_questions": "", "participant_id_host": "", "ip_address_host": "", "answering_started": False, "checking_started": False, "sections": [], "question_numbers": [""] }
+    request_cache[("quiz_details", quiz_id)] = quiz_details
+    return(quiz_details)
+
+
+def get_question_numbers(quiz_id):
+    return(read_quiz_details(quiz_id)["question_numbers"])
+
+
+@instrumented
+def get_quiz_details(quiz_id):
+    quiz_details = read_quiz_details(quiz_id)
+    quiz_name = quiz_details["quiz_name"]
+    nbr_of_questions = quiz_details["nbr_of_questions"]
+    error_text = ""
     if quiz_name == "" or nbr_of_questions == "":
         error_text = "unknown quiz: {0}".format(quiz_id)
     return(quiz_name, nbr_of_questions, error_text)
 
 
 def get_participant_details(quiz_id, participant_id):
+    request_cache = get_request_cache()
+    if ("participant_name", quiz_id, participant_id) in request_cache:
+        return(request_cache[("participant_name", quiz_id, participant_id)])
     participant_name = ""
-    infile = open(DATA_DIR+quiz_id+"/"+participant_id, "r")
-    csvreader = csv.reader(infile)
-    for row in csvreader:
+    rows, offset = read_log_rows(quiz_id, get_log_file_name(quiz_id, participant_id), events=[PARTICIPANT])
+    for row in rows:
         if row[1] == PARTICIPANT and row[4] == participant_id:
             participant_name = row[5]
+    request_cache[("participant_name", quiz_id, participant_id)] = participant_name
     return(participant_name)
 
 
 def answering_started(quiz_id):
-    return_value = False
-    infile = open(DATA_DIR+quiz_id+"/"+LOG_FILE, "r")
-    csvreader = csv.reader(infile)
-    for row in csvreader:
-        if row[1] == ANSWER and row[2] == quiz_id:
-            return_value = True
-            break
-        if row[1] == STATUS and row[2] == quiz_id and row[5] == STARTED:
-            return_value = True
-            break
-    infile.close()
-    return(return_value)
+    return(read_quiz_details(quiz_id)["answering_started"])
 
 
+@instrumented
 def is_quiz_host(quiz_id, participant_id, ip_address):
-    infile = open(DATA_DIR+quiz_id+"/"+LOG_FILE, "r")
-    csvreader = csv.reader(infile)
-    participant_id_host = ""
-    ip_address_host = ""
-    for row in csvreader:
-        if row[1] == START_QUIZ and row[2] == quiz_id:
-            participant_id_host = row[5]
-            ip_address_host = row[6]
-    infile.close()
-    return(participant_id == participant_id_host and ip_address == ip_address_host)
+    quiz_details = read_quiz_details(quiz_id)
+    return(participant_id == quiz_details["participant_id_host"] and ip_address == quiz_details["ip_address_host"])
 
 
 def get_checkee_id(quiz_id, participant_id):
-    infile = open(DATA_DIR+quiz_id+"/"+participant_id, "r")
-    csvreader = csv.reader(infile)
+    if get_storage_mode(quiz_id) == SQLITE_STORAGE:
+        checkee_id = sqlite_log.read_checkee_id(DATABASE_FILE, quiz_id, participant_id)
+        if checkee_id == None:
+            return("notfound")
+        return(checkee_id)
+    rows, offset = read_log_rows(quiz_id, get_log_file_name(quiz_id, participant_id), events=[CHECKER])
     checkee_id = "notfound"
-    for row in csvreader:
+    for row in rows:
         if row[1] == CHECKER and row[2] == quiz_id and row[3] == participant_id:
             checkee_id = str(row[4])
-    infile.close()
     return(checkee_id)
 
 
@@ -506,11 +1310,11 @@ def start_quiz():
             if len(error_text) > 0:
                 raise ValueError(error_text)
             participant_name = get_participant_details(quiz_id, participant_id)
-            quiz_name, quiz_date, results, error_text = read_results(quiz_id)
+            result_table = render_result_table(quiz_id, participant_name, participant_id, template_name=WAIT_TABLE)
             participate_url = request.host_url[0:len(request.host_url)-1]+BASE_URL+PARTICIPATE
             open_answering_url = request.host_url[0:len(request.host_url)-1]+BASE_URL+OPEN_ANSWERING
             open_checking_url = request.host_url[0:len(request.host_url)-1]+BASE_URL+OPEN_CHECKING
-            return(render_template(WAIT+HTML_SUFFIX, next_url=BASE_URL+ENTER_ANSWERS, this_url=BASE_URL+WAIT, participate_url=participate_url, open_answering_url=open_answering_url, open_checking_url=open_checking_url, quiz_id=quiz_id, quiz_name=quiz_name, participant_id=participant_id, participant_name=participant_name, results=sort_results_list(results.values())))
+            return(render_template(WAIT+HTML_SUFFIX, scoreboard_events_url=get_scoreboard_events_url(), wait_for_start_url=BASE_URL+WAIT_FOR_START, next_url=BASE_URL+ENTER_ANSWERS, this_url=BASE_URL+WAIT, participate_url=participate_url, open_answering_url=open_answering_url, open_checking_url=open_checking_url, quiz_id=quiz_id, quiz_name=quiz_name, participant_id=participant_id, participant_name=participant_name, result_table=result_table))
     except Exception as e:
         error_text += ERROR+" (start_quiz): "+str(e)
     return(render_template("start_quiz"+HTML_SUFFIX, next_url=BASE_URL+"start_quiz", error_text=error_text))
@@ -537,14 +1341,10 @@ def wait():
         if "participant_id" in request.form:
             participant_id = request.form["participant_id"]
         else:
-            for i in range(0, 100):
-                participant_id = str(get_random_number())
-                if not os.path.isfile(DATA_DIR+quiz_id+"/"+participant_id):
-                    break
-                elif i < 99:
-                    continue
-                else:
-                    raise ValueError("cannot create participant id")
+            # check the name before the participant file is created
+            if str(request.form["participant_name"]).strip() == "":
+                raise ValueError("empty participant name")
+            participant_id = reserve_participant_id(quiz_id)
         if participant_id not in results:
             participant_name = str(request.form["participant_name"]).strip()
             if participant_name == "":
@@ -557,7 +1357,7 @@ def wait():
             if participant_name_new != "" and participant_name_new != participant_name:
                 write_log([PARTICIPANT, quiz_id, request.remote_addr, participant_id, participant_name_new], quiz_id, participant_id=participant_id)
                 participant_name = participant_name_new
-        quiz_name, quiz_date, results, error_text = read_results(quiz_id)
+        result_table = render_result_table(quiz_id, participant_name, participant_id, template_name=WAIT_TABLE)
         participate_url = ""
         open_answering_url = ""
         open_checking_url = ""
@@ -565,7 +1365,7 @@ def wait():
             participate_url = request.host_url[0:len(request.host_url)-1]+BASE_URL+PARTICIPATE
             open_answering_url = request.host_url[0:len(request.host_url)-1]+BASE_URL+OPEN_ANSWERING
             open_checking_url = request.host_url[0:len(request.host_url)-1]+BASE_URL+OPEN_CHECKING
-        return(render_template(WAIT+HTML_SUFFIX, next_url=BASE_URL+ENTER_ANSWERS, this_url=BASE_URL+WAIT, participate_url=participate_url, open_answering_url=open_answering_url, open_checking_url=open_checking_url, quiz_id=quiz_id, quiz_name=quiz_name, participant_id=participant_id, participant_name=participant_name, results=sort_results_list(results.values())))
+        return(render_template(WAIT+HTML_SUFFIX, scoreboard_events_url=get_scoreboard_events_url(), wait_for_start_url=BASE_URL+WAIT_FOR_START, next_url=BASE_URL+ENTER_ANSWERS, this_url=BASE_URL+WAIT, participate_url=participate_url, open_answering_url=open_answering_url, open_checking_url=open_checking_url, quiz_id=quiz_id, quiz_name=quiz_name, participant_id=participant_id, participant_name=participant_name, result_table=result_table))
     except Exception as e:
         error_text += ERROR+" ({0}): ".format(WAIT)+str(e)
     return(render_template(ERROR+HTML_SUFFIX, error_text=error_text))
@@ -599,27 +1399,32 @@ def enter_answers():
         ip_address = request.remote_addr
         if not answering_started(quiz_id) and not is_quiz_host(quiz_id, participant_id, ip_address):
             return(wait())
-        answers = read_answers(quiz_id, nbr_of_questions, ip_address, participant_id)
+        answers = read_answers(quiz_id, nbr_of_questions, ip_address, participant_id, question_range=get_page_question_range(page_nbr, nbr_of_questions))
         status = read_status(quiz_id, ip_address, participant_id)
         if status == WAITING:
             write_log([STATUS, quiz_id, request.remote_addr, participant_id, STARTED], quiz_id)
             write_log([STATUS, quiz_id, request.remote_addr, participant_id, STARTED], quiz_id, participant_id=participant_id)
+            if not answering_started(quiz_id):
+                update_manifest(quiz_id, { "answering_started": True })
             status = STARTED
         if status != STARTED:
             return(examine_results())
-        last_changed_key = str(10*(int(page_nbr)-1))
+        last_changed_key = str(QUESTIONS_PER_PAGE*(int(page_nbr)-1))
         answers_changed = False
+        answer_rows = []
         for key in request.form:
             key = str(key)
             answer = request.form[key]
             if re.search("^[0-9]+$",key) and key in answers and answer != answers[key]:
-                write_log([ANSWER, quiz_id, ip_address, participant_id, key, answer], quiz_id, participant_id=participant_id)
+                answer_rows.append([ANSWER, quiz_id, ip_address, participant_id, key, answer])
                 answers[key] = answer
                 last_changed_key = key
                 answers_changed = True
+        if answers_changed:
+            write_log_rows(answer_rows, quiz_id, participant_id=participant_id)
         #if answers_changed:
         #    return(back())
-        return(render_template(ENTER_ANSWERS+HTML_SUFFIX, next_url=BASE_URL+ENTER_ANSWERS, final_url=BASE_URL+EXAMINE_RESULTS, participant_name=participant_name, participant_id=participant_id, quiz_id=quiz_id, nbr_of_questions=nbr_of_questions, page_nbr=page_nbr, answers=answers, last_changed_key=last_changed_key, status=status, question_numbers=make_question_numbers(nbr_of_questions)))
+        return(render_template(ENTER_ANSWERS+HTML_SUFFIX, next_url=BASE_URL+ENTER_ANSWERS, final_url=BASE_URL+EXAMINE_RESULTS, participant_name=participant_name, participant_id=participant_id, quiz_id=quiz_id, nbr_of_questions=nbr_of_questions, page_nbr=page_nbr, answers=answers, last_changed_key=last_changed_key, status=status, question_numbers=get_question_numbers(quiz_id)))
     except Exception as e:
         error_text += ERROR+" ({0}): ".format(ENTER_ANSWERS)+str(e)
     return(render_template(ERROR+HTML_SUFFIX, error_text=error_text))
@@ -640,17 +1445,21 @@ def examine_results():
         if status == STARTED:
             write_log([STATUS, quiz_id, request.remote_addr, participant_id, FINISHED], quiz_id, participant_id=participant_id)
             status = FINISHED
+            make_snapshot(quiz_id, participant_id)
         if "approve" in request.form:
             write_log([STATUS, quiz_id, request.remote_addr, participant_id, APPROVED], quiz_id, participant_id=participant_id)
             status = APPROVED
-        quiz_name, quiz_date, results, error_text = read_results(quiz_id, error_text=error_text)
         open_checking_url = ""
         if is_quiz_host(quiz_id, participant_id, ip_address):
             open_checking_url = BASE_URL+OPEN_CHECKING
         checkee_id = ""
         if get_checkee_id(quiz_id, participant_id) != "notfound":
             checkee_id = "other"
-        return(render_template(EXAMINE_RESULTS+HTML_SUFFIX, next_url=BASE_URL+CHECK_ANSWERS, this_url=BASE_URL+EXAMINE_RESULTS, download_url=BASE_URL+DOWNLOAD, download_all_url=BASE_URL+DOWNLOAD_ALL, open_checking_url=open_checking_url, participant_name=participant_name, participant_id=participant_id, quiz_id=quiz_id, nbr_of_questions=nbr_of_questions, results=sort_results_list(results.values()), quiz_name=quiz_name, checkee_id=checkee_id, question_numbers=make_question_numbers(nbr_of_questions)))
+        check_url = ""
+        if open_checking_url != "" and checkee_id != "":
+            check_url = BASE_URL+CHECK_ANSWERS
+        result_table = render_result_table(quiz_id, participant_name, participant_id, check_url=check_url)
+        return(render_template(EXAMINE_RESULTS+HTML_SUFFIX, scoreboard_events_url=get_scoreboard_events_url(), next_url=BASE_URL+CHECK_ANSWERS, this_url=BASE_URL+EXAMINE_RESULTS, download_url=BASE_URL+DOWNLOAD, download_all_url=BASE_URL+DOWNLOAD_ALL, open_checking_url=open_checking_url, participant_name=participant_name, participant_id=participant_id, quiz_id=quiz_id, nbr_of_questions=nbr_of_questions, result_table=result_table, quiz_name=quiz_name, checkee_id=checkee_id, question_numbers=get_question_numbers(quiz_id)))
     except Exception as e:
         error_text += ERROR+" ({0}): ".format(EXAMINE_RESULTS)+str(e)
     return(render_template(ERROR+HTML_SUFFIX, error_text=error_text))
@@ -689,25 +1498,29 @@ def check_answers():
             open_checking_url = ""
             if is_quiz_host(quiz_id, participant_id, ip_address):
                 open_checking_url = BASE_URL+OPEN_CHECKING
-            quiz_name, quiz_date, results, error_text = read_results(quiz_id, error_text=error_text)
-            return(render_template(EXAMINE_RESULTS+HTML_SUFFIX, next_url=BASE_URL+CHECK_ANSWERS, this_url=BASE_URL+EXAMINE_RESULTS, download_url=BASE_URL+DOWNLOAD, download_all_url=BASE_URL+DOWNLOAD_ALL, open_checking_url=open_checking_url, participant_name=participant_name, participant_id=participant_id, quiz_id=quiz_id, nbr_of_questions=nbr_of_questions, results=sort_results_list(results.values()), quiz_name=quiz_name, checkee_id=""))
+            result_table = render_result_table(quiz_id, participant_name, participant_id)
+            return(render_template(EXAMINE_RESULTS+HTML_SUFFIX, scoreboard_events_url=get_scoreboard_events_url(), next_url=BASE_URL+CHECK_ANSWERS, this_url=BASE_URL+EXAMINE_RESULTS, download_url=BASE_URL+DOWNLOAD, download_all_url=BASE_URL+DOWNLOAD_ALL, open_checking_url=open_checking_url, participant_name=participant_name, participant_id=participant_id, quiz_id=quiz_id, nbr_of_questions=nbr_of_questions, result_table=result_table, quiz_name=quiz_name, checkee_id=""))
         participant_name_check = get_participant_details(quiz_id, participant_id_check)
         status = read_status(quiz_id, ip_address, participant_id)
         if status == FINISHED and participant_id_check != participant_id:
             write_log([STATUS, quiz_id, request.remote_addr, participant_id, CHECKING], quiz_id, participant_id=participant_id)
             status = CHECKING
-        answers = read_answers_no_ip(quiz_id, nbr_of_questions, participant_id_check)
-        checks, check_counts = read_checks(quiz_id, nbr_of_questions, participant_id_check)
+        question_range = get_page_question_range(page_nbr, nbr_of_questions)
+        answers = read_answers_no_ip(quiz_id, nbr_of_questions, participant_id_check, question_range=question_range)
+        checks, check_counts = read_checks(quiz_id, nbr_of_questions, participant_id_check, question_range=question_range)
         if participant_id != participant_id_check or is_quiz_host(quiz_id, participant_id, ip_address):
+            check_rows = []
             for key in request.form:
                 key = str(key)
                 check = str(request.form[key]).strip()
                 if re.search("^[0-9]+$",key) and key in checks and check != checks[key]:
-                    write_log([CHECK, quiz_id, participant_id_check, participant_id, key, check], quiz_id, participant_id=participant_id_check)
+                    check_rows.append([CHECK, quiz_id, participant_id_check, participant_id, key, check])
                     checks[key] = check
-        quiz_name, quiz_date, results, error_text = read_results(quiz_id)
-        checks, check_counts = read_checks(quiz_id, nbr_of_questions, participant_id_check)
-        return(render_template(CHECK_ANSWERS+HTML_SUFFIX, next_url=BASE_URL+CHECK_ANSWERS, final_url=BASE_URL+EXAMINE_RESULTS, download_url=BASE_URL+DOWNLOAD, participant_name=participant_name, participant_id=participant_id, quiz_id=quiz_id, nbr_of_questions=nbr_of_questions, answers=answers, participant_id_check=anonymize_id(quiz_id, participant_id, participant_id_check), participant_name_check=participant_name_check, page_nbr=page_nbr, checks=checks, results=sort_results_list(results.values()), check_counts=check_counts, question_numbers=make_question_numbers(nbr_of_questions)))
+            if len(check_rows) > 0:
+                write_log_rows(check_rows, quiz_id, participant_id=participant_id_check)
+        result_table = render_result_table(quiz_id, participant_name, participant_id)
+        checks, check_counts = read_checks(quiz_id, nbr_of_questions, participant_id_check, question_range=question_range)
+        return(render_template(CHECK_ANSWERS+HTML_SUFFIX, next_url=BASE_URL+CHECK_ANSWERS, final_url=BASE_URL+EXAMINE_RESULTS, download_url=BASE_URL+DOWNLOAD, participant_name=participant_name, participant_id=participant_id, quiz_id=quiz_id, nbr_of_questions=nbr_of_questions, answers=answers, participant_id_check=anonymize_id(quiz_id, participant_id, participant_id_check), participant_name_check=participant_name_check, page_nbr=page_nbr, checks=checks, result_table=result_table, check_counts=check_counts, question_numbers=get_question_numbers(quiz_id)))
     except Exception as e:
         error_text += ERROR+" ({0}): ".format(CHECK_ANSWERS)+str(e)
     return(render_template(ERROR+HTML_SUFFIX, error_text=error_text))
@@ -719,8 +1532,8 @@ def download():
     try:
         quiz_id = request.form["quiz_id"]
         participant_id = request.form["participant_id"]
-        text, filename = make_quiz_result_text(quiz_id, participant_id)
-        return(Response(text, mimetype="text/plain", headers={"Content-disposition": "attachment; filename={0}.txt".format(filename)}))
+        lines, filename = make_quiz_result_lines(quiz_id, participant_id)
+        return(Response(lines, mimetype="text/plain", headers={"Content-disposition": "attachment; filename={0}.txt".format(filename)}))
     except Exception as e:
         error_text += ERROR+" ({0}): ".format(DOWNLOAD)+str(e)
     return(render_template(ERROR+HTML_SUFFIX, error_text=error_text))
@@ -732,46 +1545,52 @@ def download_all():
     try:
         quiz_id = request.form["quiz_id"]
         participant_id = request.form["participant_id"]
-        text, filename = make_quiz_result_text_all(quiz_id)
-        return(Response(text, mimetype="text/plain", headers={"Content-disposition": "attachment; filename={0}.csv".format(filename)}))
+        rows, filename = make_quiz_result_rows_all(quiz_id)
+        return(Response(generate_csv_lines(rows), mimetype="text/plain", headers={"Content-disposition": "attachment; filename={0}.csv".format(filename)}))
     except Exception as e:
         error_text += ERROR+" ({0}): ".format(DOWNLOAD_ALL)+str(e)
     return(render_template(ERROR+HTML_SUFFIX, error_text=error_text))
 
 
-@app.route("/"+"show_answers", methods=["POST"])
+@app.route("/"+SHOW_ANSWERS, methods=["POST"])
 def show_answers():
     error_text = ""
     try:
         quiz_id = request.form["quiz_id"]
         participant_id = request.form["participant_id"]
         ip_address = request.remote_addr
-        results = {}
+        quiz_name, nbr_of_questions, error_text = get_quiz_details(quiz_id)
         if is_quiz_host(quiz_id, participant_id, ip_address):
-            quiz_name, quiz_date, results = read_results_from_logfile(quiz_id)
+            answer_groups = read_answer_groups(quiz_id, nbr_of_questions)
+        else:
+            answer_groups = [ [] for i in range(1, int(nbr_of_questions)+1) ]
+        return(render_template(SHOW_ANSWERS+HTML_SUFFIX, next_url=BASE_URL+EXAMINE_RESULTS, mark_url=BASE_URL+MARK_ANSWER_GROUP, participant_id=participant_id, quiz_id=quiz_id, nbr_of_questions=nbr_of_questions, answer_groups=answer_groups, question_numbers=get_question_numbers(quiz_id)))
+    except Exception as e:
+        error_text += ERROR+" ({0}): ".format(SHOW_ANSWERS)+str(e)
+    return(render_template(ERROR+HTML_SUFFIX, error_text=error_text))
+
+
+@app.route("/"+MARK_ANSWER_GROUP, methods=["POST"])
+def mark_answer_group():
+    error_text = ""
+    try:
+        quiz_id = request.form["quiz_id"]
+        participant_id = request.form["participant_id"]
+        question_nbr = request.form["question_nbr"]
+        normalized_answer = request.form["normalized_answer"]
+        check = request.form["check"]
+        ip_address = request.remote_addr
         quiz_name, nbr_of_questions, error_text = get_quiz_details(quiz_id)
-        inverted_results = []
-        for i in range(1, int(nbr_of_questions)+1):
-            answers = []
-            for key in sorted(results.keys(), key=lambda k: results[k]["participant_name"].lower()):
-                if not "answers" in results[key] or len(results[key]["answers"]) == 0:
-                    continue
-                answer = ""
-                if str(i) in results[key]["answers"]:
-                    answer = results[key]["answers"][str(i)]
-                check = ""
-                if "checks" in results[key]:
-                    if str(i) in results[key]["checks"]:
-                        check = results[key]["checks"][str(i)]
-                checker = ""
-                if "checker" in results[key]:
-                    checker = results[key]["checker"]
-                answers.append({"participant_name":results[key]["participant_name"], "answer": answer, "checker": checker, "check": check})
-            answers = [answer for answer in sorted(answers, key=lambda answer: answer["answer"].lower())]
-            inverted_results.append(answers)
-        return(render_template("show_answers"+HTML_SUFFIX, next_url=BASE_URL+EXAMINE_RESULTS, participant_id=participant_id, quiz_id=quiz_id, results=results.values(), nbr_of_questions=nbr_of_questions, inverted_results=inverted_results, question_numbers=make_question_numbers(nbr_of_questions)))
+        if len(error_text) > 0:
+            raise ValueError(error_text)
+        if not is_valid_check(nbr_of_questions, question_nbr, check):
+            raise ValueError("invalid mark: {0} {1}".format(question_nbr, check))
+        if is_quiz_host(quiz_id, participant_id, ip_address):
+            question_group = find_answer_group(quiz_id, nbr_of_questions, question_nbr, normalized_answer)
+            write_checks(quiz_id, participant_id, [ (member["participant_id"], question_nbr, check) for member in question_group["members"] ])
+        return(show_answers())
     except Exception as e:
-        error_text += ERROR+" (show_answers): "+str(e)
+        error_text += ERROR+" ({0}): ".format(MARK_ANSWER_GROUP)+str(e)
     return(render_template(ERROR+HTML_SUFFIX, error_text=error_text))
 
 
@@ -793,6 +1612,7 @@ def open_checking():
                 checker = finished_ids[i]
                 checkee = finished_ids[i-1]
                 write_log([CHECKER, quiz_id, checker, checkee], quiz_id, participant_id=checker)
+            update_manifest(quiz_id, { "checking_started": True })
         return(examine_results())
     except Exception as e:
         error_text += ERROR+" ({0}): ".format(OPEN_CHECKING)+str(e)
@@ -808,6 +1628,7 @@ def open_answering():
         ip_address = request.remote_addr
         if is_quiz_host(quiz_id, participant_id, ip_address):
             write_log([ANSWER, quiz_id, ip_address, participant_id, "1", ""], quiz_id)
+            update_manifest(quiz_id, { "answering_started": True })
         return(wait())
     except Exception as e:
         error_text += ERROR+" ({0}): ".format(OPEN_ANSWERING)+str(e)
@@ -820,11 +1641,169 @@ def back():
 
 @app.route("/ajax_submit_answer", methods=["POST"])
 def ajax_submit_answer():
+    return(ajax_submit_answers())
+
+
+@app.route("/ajax_submit_answers", methods=["POST"])
+def ajax_submit_answers():
+    quiz_id = request.form["quiz_id"]
+    participant_id = request.form["participant_id"]
+    question_ids = request.form.getlist("question_id")
+    answer_strings = request.form.getlist("answer_string")
+    ip_address = request.remote_addr
+    if not re.search("^[0-9]+$", quiz_id) or not re.search("^[0-9]+$", participant_id) or len(question_ids) != len(answer_strings) or not log_file_exists(quiz_id, participant_id):
+        return(Response("invalid answers", status=400, mimetype="text/plain"))
+    rows = []
+    for question_id, answer_string in zip(question_ids, answer_strings):
+        if re.search("^[0-9]+$", question_id):
+            rows.append([ANSWER, quiz_id, ip_address, participant_id, question_id, answer_string])
+    if len(rows) > 0:
+        write_log_rows(rows, quiz_id, participant_id=participant_id)
+    return(Response(status=204))
+
+
+@app.route("/ajax_submit_checks", methods=["POST"])
+def ajax_submit_checks():
     quiz_id = request.form["quiz_id"]
     participant_id = request.form["participant_id"]
-    question_id = request.form["question_id"]
-    answer_string = request.form["answer_string"]
     ip_address = request.remote_addr
-    write_log([ANSWER, quiz_id, ip_address, participant_id, question_id, answer_string], quiz_id, participant_id=participant_id)
-    return()
+    if not re.search("^[0-9]+$", quiz_id) or not re.search("^[0-9]+$", participant_id) or not log_file_exists(quiz_id, participant_id):
+        return(Response("invalid checks", status=400, mimetype="text/plain"))
+    quiz_name, nbr_of_questions, error_text = get_quiz_details(quiz_id)
+    if len(error_text) > 0:
+        return(Response(error_text, status=400, mimetype="text/plain"))
+    is_host = is_quiz_host(quiz_id, participant_id, ip_address)
+    checks = []
+    checkee_ids = {}
+    if "normalized_answer" in request.form:
+        # all answers equal to the given one on one question
+        question_nbr = request.form["question_nbr"]
+        check = request.form["check"]
+        if not is_host:
+            return(Response("only the quiz host can check answer groups", status=403, mimetype="text/plain"))
+        if not is_valid_check(nbr_of_questions, question_nbr, check):
+            return(Response("invalid checks", status=400, mimetype="text/plain"))
+        question_group = find_answer_group(quiz_id, nbr_of_questions, question_nbr, request.form["normalized_answer"])
+        for member in question_group["members"]:
+            checks.append((member["participant_id"], question_nbr, check))
+            checkee_ids[member["participant_id"]] = member["participant_id"]
+    else:
+        participant_id_checks = request.form.getlist("participant_id_check")
+        question_ids = request.form.getlist("question_id")
+        check_values = request.form.getlist("check")
+        if len(participant_id_checks) != len(question_ids) or len(question_ids) != len(check_values):
+            return(Response("invalid checks", status=400, mimetype="text/plain"))
+        for participant_id_check, question_id, check in zip(participant_id_checks, question_ids, check_values):
+            check = check.strip()
+            if not is_valid_check(nbr_of_questions, question_id, check):
+                return(Response("invalid checks", status=400, mimetype="text/plain"))
+            # as in check_answers: an empty id is the participant assigned to the checker
+            if participant_id_check not in checkee_ids:
+                if participant_id_check == "":
+                    checkee_ids[participant_id_check] = get_checkee_id(quiz_id, participant_id)
+                elif is_host:
+                    checkee_ids[participant_id_check] = participant_id_check
+                else:
+                    return(Response("only the quiz host can check other participants", status=403, mimetype="text/plain"))
+            if checkee_ids[participant_id_check] not in ("notfound", participant_id) or is_host:
+                checks.append((checkee_ids[participant_id_check], question_id, check))
+    if len(checks) > 0 and not is_host and read_status(quiz_id, ip_address, participant_id) == FINISHED:
+        write_log([STATUS, quiz_id, ip_address, participant_id, CHECKING], quiz_id, participant_id=participant_id)
+    nbr_of_written_checks = write_checks(quiz_id, participant_id, checks)
+    quiz_name, quiz_date, results, error_text = read_results(quiz_id)
+    scores = { participant_id_check: results[checkee_ids[participant_id_check]]["correct_answers"] for participant_id_check in checkee_ids if checkee_ids[participant_id_check] in results }
+    return(Response(json.dumps({ "written": nbr_of_written_checks, "scores": scores }), mimetype="application/json"))
+
 
+@app.route("/"+SCOREBOARD_EVENTS, methods=["GET"])
+def scoreboard_events():
+    quiz_id = request.args.get("quiz_id", "")
+    error_text = check_quiz_id(quiz_id)
+    if len(error_text) > 0:
+        return(Response(error_text, status=404, mimetype="text/plain"))
+    # a CGI process would be kept alive for every viewer: 204 tells the
+    # browser to stop reconnecting; deployments route the path to waiting_room.py
+    if request.environ.get("wsgi.run_once", False):
+        return(Response(status=204))
+    # the stream runs outside the request context
+    return(Response(scoreboard_event_stream(quiz_id), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}))
+
+
+@app.route("/"+RESULTS_JSON, methods=["GET"])
+def results_json():
+    quiz_id = request.args.get("quiz_id", "")
+    error_text = check_quiz_id(quiz_id)
+    if len(error_text) > 0:
+        return(Response(json.dumps({ "error": error_text }), status=404, mimetype="application/json"))
+    # the version only needs the log file sizes: unchanged quizzes are not read
+    version = get_quiz_version(quiz_id)
+    if request.if_none_match.contains(version):
+        response = Response(status=304)
+    else:
+        quiz_name, quiz_date, entries, summary = make_scoreboard(quiz_id)
+        response = Response(json.dumps({ "quiz_id": quiz_id, "quiz_name": quiz_name, "quiz_date": quiz_date, "version": version, "summary": summary, "results": entries }), mimetype="application/json")
+    response.set_etag(version)
+    response.headers["Cache-Control"] = "no-cache"
+    return(response)
+
+
+def start_request_metrics():
+    get_request_metrics()
+
+
+def finish_request_metrics(response):
+    # runs before the body is sent: for streamed responses (downloads and
+    # scoreboard events) the time ends at the headers
+    request_metrics = get_request_metrics()
+    seconds = time.perf_counter()-request_metrics["start"]
+    route = "unknown"
+    if request.url_rule != None:
+        route = request.url_rule.rule
+    with metrics_lock:
+        if route not in route_metrics:
+            route_metrics[route] = { "seconds": make_histogram(), "files": 0, "bytes": 0, "rows": 0 }
+        observe(route_metrics[route]["seconds"], seconds)
+        for counter in ("files", "bytes", "rows"):
+            route_metrics[route][counter] += request_metrics[counter]
+    functions = request_metrics["functions"]
+    response.headers[METRICS_HEADER] = ";".join([ "time={0:.4f}".format(seconds), 
+                                                  "files={0}".format(request_metrics["files"]), 
+                                                  "bytes={0}".format(request_metrics["bytes"]), 
+                                                  "rows={0}".format(request_metrics["rows"]) ]+
+                                                [ "{0}={1}:{2:.4f}".format(name, functions[name][0], functions[name][1]) for name in sorted(functions) ])
+    return(response)
+
+
+def format_histogram(metric_name, label_name, label_value, histogram):
+    lines = []
+    for bound, count in zip(METRICS_BUCKETS, histogram["buckets"]):
+        lines.append('{0}_bucket{{{1}="{2}",le="{3}"}} {4}'.format(metric_name, label_name, label_value, bound, count))
+    lines.append('{0}_bucket{{{1}="{2}",le="+Inf"}} {3}'.format(metric_name, label_name, label_value, histogram["count"]))
+    lines.append('{0}_sum{{{1}="{2}"}} {3}'.format(metric_name, label_name, label_value, histogram["sum"]))
+    lines.append('{0}_count{{{1}="{2}"}} {3}'.format(metric_name, label_name, label_value, histogram["count"]))
+    return(lines)
+
+
+def metrics():
+    # timings and traffic are not for participants: unknown clients get a 404
+    if request.remote_addr not in METRICS_ADDRESSES:
+        return(Response("not found", status=404, mimetype="text/plain"))
+    # the metrics of this process only: every server worker has its own
+    with metrics_lock:
+        lines = [ "# TYPE quiz_request_seconds histogram" ]
+        for route in sorted(route_metrics):
+            lines.extend(format_histogram("quiz_request_seconds", "route", route, route_metrics[route]["seconds"]))
+        for counter, metric_name in (("files", "quiz_request_files_opened_total"), ("bytes", "quiz_request_bytes_read_total"), ("rows", "quiz_request_rows_parsed_total")):
+            lines.append("# TYPE {0} counter".format(metric_name))
+            for route in sorted(route_metrics):
+                lines.append('{0}{{route="{1}"}} {2}'.format(metric_name, route, route_metrics[route][counter]))
+        lines.append("# TYPE quiz_function_seconds histogram")
+        for function_name in sorted(function_metrics):
+            lines.extend(format_histogram("quiz_function_seconds", "function", function_name, function_metrics[function_name]))
+    return(Response("\n".join(lines)+"\n", mimetype="text/plain"))
+
+
+if INSTRUMENTATION:
+    app.before_request(start_request_metrics)
+    app.after_request(finish_request_metrics)
+    app.add_url_rule("/"+METRICS, METRICS, metrics, methods=["GET"])
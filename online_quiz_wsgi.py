@@ -0,0 +1,23 @@
+#!/usr/bin/python3
+# online_quiz_wsgi.py: run online quiz as a long-running WSGI application
+# usage: gunicorn -c deploy/gunicorn.conf.py online_quiz_wsgi:application
+# each worker process keeps the parsed quiz state between requests;
+# workers stay consistent because every request checks the log file sizes
+
+import os
+
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from online_quiz import app as application
+
+
+# number of reverse proxies in front of the application: the client address
+# is taken from X-Forwarded-For, since the host is recognized by its address
+PROXIES = int(os.environ.get("ONLINE_QUIZ_PROXIES", "1"))
+if PROXIES > 0:
+    application.wsgi_app = ProxyFix(application.wsgi_app, x_for=PROXIES, x_proto=PROXIES, x_host=PROXIES)
+
+
+if __name__ == "__main__":
+    from wsgiref.simple_server import make_server
+    make_server("127.0.0.1", 8000, application).serve_forever()
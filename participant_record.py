@@ -0,0 +1,292 @@
+#!/usr/bin/python3
+# participant_record.py: compact results of one online quiz participant
+# usage: imported by online_quiz.py
+# answers and checks are kept in lists indexed by question number and
+# statuses as small ints; the records can still be read like the dicts
+# they replace, so the templates and the result code index them by key
+
+import re
+import sys
+from collections.abc import Mapping
+
+
+VERDICT_UNCHECKED = 0 # codes of checks, also used in the verdict matrix
+VERDICT_WRONG = 1
+VERDICT_CORRECT = 2
+VERDICT_OTHER = 3
+VERDICT_CODES = { "wrong": VERDICT_WRONG, "correct": VERDICT_CORRECT }
+VERDICT_NAMES = { VERDICT_WRONG: "wrong", VERDICT_CORRECT: "correct" }
+
+# statuses are stored as their position in this list, which grows as needed
+status_names = [ "" ]
+status_codes = { "": 0 }
+
+# question numbers by index and back, made once for the usual quiz sizes
+QUESTION_NBRS = [ str(i) for i in range(1, 1001) ]
+QUESTION_INDEXES = { question_nbr: index for index, question_nbr in enumerate(QUESTION_NBRS) }
+
+
+def get_question_index(question_nbr):
+    if question_nbr in QUESTION_INDEXES:
+        return(QUESTION_INDEXES[question_nbr])
+    # question numbers as written by the forms: 1, 2, ... without leading zeros
+    if re.search(r"^[1-9][0-9]*\Z", question_nbr):
+        return(int(question_nbr)-1)
+    return(None)
+
+
+def get_question_nbrs(nbr_of_questions):
+    if nbr_of_questions <= len(QUESTION_NBRS):
+        return(QUESTION_NBRS)
+    return([ str(i) for i in range(1, nbr_of_questions+1) ])
+
+
+def get_status_code(status):
+    if status not in status_codes:
+        status_codes[status] = len(status_names)
+        status_names.append(status)
+    return(status_codes[status])
+
+
+class AnswerMap(Mapping):
+    # answers by question number; None marks questions without an answer
+    __slots__ = ("answers", "answered", "extra", "size")
+
+    def __init__(self):
+        self.answers = []
+        self.answered = bytearray() # 1 for non-empty answers, for the verdict matrix
+        self.extra = None # answers to questions without an index
+        self.size = 0
+
+    def __getitem__(self, question_nbr):
+        index = get_question_index(question_nbr)
+        if index == None:
+            if self.extra == None:
+                raise KeyError(question_nbr)
+            return(self.extra[question_nbr])
+        if index >= len(self.answers) or self.answers[index] == None:
+            raise KeyError(question_nbr)
+        return(self.answers[index])
+
+    def __setitem__(self, question_nbr, answer):
+        self.replace(question_nbr, answer)
+
+    def replace(self, question_nbr, answer):
+        # sets the answer and returns the one it replaces, or None
+        index = get_question_index(question_nbr)
+        if index == None:
+            if self.extra == None:
+                self.extra = {}
+            if question_nbr not in self.extra:
+                self.size += 1
+            previous_answer = self.extra.get(question_nbr)
+            self.extra[question_nbr] = answer
+            return(previous_answer)
+        if index >= len(self.answers):
+            self.answers.extend([ None ]*(index+1-len(self.answers)))
+            self.answered.extend(bytes(index+1-len(self.answered)))
+        previous_answer = self.answers[index]
+        if previous_answer == None:
+            self.size += 1
+        # the same answers are given by many participants
+        self.answers[index] = sys.intern(answer)
+        self.answered[index] = int(answer != "")
+        return(previous_answer)
+
+    def __contains__(self, question_nbr):
+        index = get_question_index(question_nbr)
+        if index == None:
+            return(self.extra != None and question_nbr in self.extra)
+        return(index < len(self.answers) and self.answers[index] != None)
+
+    def __iter__(self):
+        for question_nbr, answer in zip(get_question_nbrs(len(self.answers)), self.answers):
+            if answer != None:
+                yield(question_nbr)
+        if self.extra != None:
+            yield from self.extra
+
+    def __len__(self):
+        return(self.size)
+
+    def items(self):
+        for question_nbr, answer in zip(get_question_nbrs(len(self.answers)), self.answers):
+            if answer != None:
+                yield((question_nbr, answer))
+        if self.extra != None:
+            yield from self.extra.items()
+
+    def get(self, question_nbr, default=None):
+        if question_nbr in self:
+            return(self[question_nbr])
+        return(default)
+
+    def copy(self):
+        answer_map = AnswerMap()
+        answer_map.answers = list(self.answers)
+        answer_map.answered = bytearray(self.answered)
+        answer_map.extra = None if self.extra == None else dict(self.extra)
+        answer_map.size = self.size
+        return(answer_map)
+
+
+class CheckMap(Mapping):
+    # checks by question number as verdict codes; checks which are not
+    # correct or wrong, or have no question index, are kept as text
+    __slots__ = ("verdicts", "extra", "size")
+
+    def __init__(self):
+        self.verdicts = bytearray()
+        self.extra = None
+        self.size = 0
+
+    def __getitem__(self, question_nbr):
+        index = get_question_index(question_nbr)
+        if index != None and index < len(self.verdicts) and self.verdicts[index] in VERDICT_NAMES:
+            return(VERDICT_NAMES[self.verdicts[index]])
+        if self.extra == None:
+            raise KeyError(question_nbr)
+        return(self.extra[question_nbr])
+
+    def __setitem__(self, question_nbr, check):
+        self.replace(question_nbr, check)
+
+    def replace(self, question_nbr, check):
+        # sets the check and returns the one it replaces, or None
+        index = get_question_index(question_nbr)
+        previous_verdict = VERDICT_UNCHECKED
+        if index != None and index < len(self.verdicts):
+            previous_verdict = self.verdicts[index]
+        if previous_verdict in VERDICT_NAMES:
+            previous_check = VERDICT_NAMES[previous_verdict]
+        elif self.extra != None:
+            previous_check = self.extra.get(question_nbr)
+        else:
+            previous_check = None
+        if previous_check == None:
+            self.size += 1
+        verdict = VERDICT_CODES.get(check, VERDICT_OTHER)
+        if index != None:
+            if index >= len(self.verdicts):
+                self.verdicts.extend(bytes(index+1-len(self.verdicts)))
+            self.verdicts[index] = verdict
+        if index == None or verdict == VERDICT_OTHER:
+            if self.extra == None:
+                self.extra = {}
+            self.extra[question_nbr] = check
+        elif self.extra != None:
+            self.extra.pop(question_nbr, None)
+        return(previous_check)
+
+    def __contains__(self, question_nbr):
+        index = get_question_index(question_nbr)
+        if index != None and index < len(self.verdicts) and self.verdicts[index] != VERDICT_UNCHECKED:
+            return(True)
+        return(self.extra != None and question_nbr in self.extra)
+
+    def __iter__(self):
+        for question_nbr, verdict in zip(get_question_nbrs(len(self.verdicts)), self.verdicts):
+            if verdict != VERDICT_UNCHECKED:
+                yield(question_nbr)
+        if self.extra != None:
+            for question_nbr in self.extra:
+                if get_question_index(question_nbr) == None:
+                    yield(question_nbr)
+
+    def __len__(self):
+        return(self.size)
+
+    def items(self):
+        for question_nbr, verdict in zip(get_question_nbrs(len(self.verdicts)), self.verdicts):
+            if verdict == VERDICT_UNCHECKED:
+                continue
+            if verdict == VERDICT_OTHER:
+                yield((question_nbr, self.extra[question_nbr]))
+            else:
+                yield((question_nbr, VERDICT_NAMES[verdict]))
+        if self.extra != None:
+            for question_nbr, check in self.extra.items():
+                if get_question_index(question_nbr) == None:
+                    yield((question_nbr, check))
+
+    def get(self, question_nbr, default=None):
+        if question_nbr in self:
+            return(self[question_nbr])
+        return(default)
+
+    def copy(self):
+        check_map = CheckMap()
+        check_map.verdicts = bytearray(self.verdicts)
+        check_map.extra = None if self.extra == None else dict(self.extra)
+        check_map.size = self.size
+        return(check_map)
+
+
+class ParticipantRecord(Mapping):
+    # the keys of the former result dicts; the scores are set by online_quiz.py
+    __slots__ = ("participant_id", "participant_name", "status_code", "status_time", "started_time", "finished_time",
+                 "answers", "checks", "checker", "answers_given", "correct_answers", "answers_checked", "solos", "comment", "scoreboard_key")
+    KEYS = ("participant_id", "participant_name", "status", "time", "answers", "checks", "checker",
+            "answers_given", "correct_answers", "answers_checked", "solos", "comment", "scoreboard_key")
+    KEY_SET = frozenset(KEYS)
+
+    def __init__(self, participant_id, participant_name):
+        self.participant_id = participant_id
+        self.participant_name = sys.intern(participant_name)
+        self.status_code = 0
+        self.status_time = "" # time taken, shown after the status
+        self.started_time = ""
+        self.finished_time = ""
+        self.answers = AnswerMap()
+        self.checks = CheckMap()
+
+    def __getitem__(self, key):
+        if key == "status":
+            return(status_names[self.status_code]+self.status_time)
+        if key == "time":
+            return({ "started": self.started_time, "finished": self.finished_time })
+        if key not in self.KEY_SET:
+            raise KeyError(key)
+        try:
+            return(getattr(self, key))
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == "status":
+            self.status_code = get_status_code(value)
+            self.status_time = ""
+        elif key == "participant_name":
+            self.participant_name = sys.intern(value)
+        elif key in self.KEY_SET and key != "time":
+            setattr(self, key, value)
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key in self.KEYS:
+            if key in self:
+                yield(key)
+
+    def __contains__(self, key):
+        if key in ("status", "time"):
+            return(True)
+        return(key in self.KEY_SET and hasattr(self, key))
+
+    def __len__(self):
+        return(len([ key for key in self ]))
+
+    def copy(self):
+        record = ParticipantRecord(self.participant_id, self.participant_name)
+        record.status_code = self.status_code
+        record.status_time = self.status_time
+        record.started_time = self.started_time
+        record.finished_time = self.finished_time
+        record.answers = self.answers.copy()
+        record.checks = self.checks.copy()
+        return(record)
+
+    def has_question_extras(self):
+        # answers or checks outside the question indexes rule out the verdict matrix
+        return((self.answers.extra != None and len(self.answers.extra) > 0) or
+               (self.checks.extra != None and len([ question_nbr for question_nbr in self.checks.extra if get_question_index(question_nbr) == None ]) > 0))
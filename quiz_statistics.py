@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+# quiz_statistics.py: season leaderboard and question statistics of all quizzes in a data directory
+# usage: quiz_statistics.py data_dir output_file [cache_file]
+# the quizzes are scored by online_quiz.py in a process pool; the summary
+# of each quiz is cached by quiz version, so re-runs only read changed quizzes;
+# the quiz directories are only read: no manifests or template caches are written
+
+import concurrent.futures
+import json
+import os
+import re
+import sys
+
+
+CACHE_FORMAT = 1 # change when the quiz summaries change
+CACHE_FILE = "quiz_statistics_cache.json"
+
+online_quiz = None
+
+
+def load_online_quiz(data_dir):
+    global online_quiz
+    # online_quiz reads its data directory and settings at import time
+    os.environ["ONLINE_QUIZ_DATA_DIR"] = os.path.join(data_dir, "")
+    os.environ["ONLINE_QUIZ_MANIFEST_WRITES"] = ""
+    os.environ["ONLINE_QUIZ_TEMPLATE_CACHE"] = ""
+    import online_quiz as online_quiz_module
+    online_quiz = online_quiz_module
+
+
+def list_quiz_ids(data_dir):
+    return([ file_name for file_name in sorted(os.listdir(data_dir)) if re.search("^[0-9]+$", file_name) and os.path.isdir(os.path.join(data_dir, file_name)) ])
+
+
+def get_quiz_version(quiz_id):
+    return(online_quiz.get_quiz_version(quiz_id))
+
+
+def summarize_quiz(quiz_id):
+    quiz_name, nbr_of_questions, error_text = online_quiz.get_quiz_details(quiz_id)
+    if len(error_text) > 0:
+        return(None)
+    quiz_name, quiz_date, results, error_text = online_quiz.read_results(quiz_id)
+    question_counts = online_quiz.make_question_counts(results)
+    participants = []
+    for rank, result in enumerate(online_quiz.sort_results_list(results.values()), start=1):
+        participants.append({ "participant_name": result["participant_name"],
+                              "rank": rank,
+                              "correct_answers": result["correct_answers"],
+                              "solos": len(result["solos"]),
+                              "answers_given": result["answers_given"] })
+    questions = []
+    for i in range(1, int(nbr_of_questions)+1):
+        question_nbr = str(i)
+        answered = len([ key for key in results if results[key]["answers"].get(question_nbr, "") != "" ])
+        question_count = question_counts.get(question_nbr, { "correct": 0, "checked": 0 })
+        questions.append({ "question_nbr": i, "answered": answered, "checked": question_count["checked"], "correct": question_count["correct"] })
+    return({ "quiz_id": quiz_id, "quiz_name": quiz_name, "quiz_date": quiz_date, "nbr_of_questions": int(nbr_of_questions), "participants": participants, "questions": questions })
+
+
+def summarize_quizzes(quiz_ids):
+    # one task per worker call: a whole list is summarized in one process
+    return([ (quiz_id, get_quiz_version(quiz_id), summarize_quiz(quiz_id)) for quiz_id in quiz_ids ])
+
+
+def read_cache(cache_file):
+    if not os.path.isfile(cache_file):
+        return({})
+    infile = open(cache_file, "r")
+    cache = json.load(infile)
+    infile.close()
+    if cache.get("format") != CACHE_FORMAT:
+        return({})
+    return(cache["quizzes"])
+
+
+def write_json(data, file_name):
+    # write and rename, so readers never see half a file
+    outfile = open(file_name+".tmp", "w")
+    json.dump(data, outfile)
+    outfile.close()
+    os.replace(file_name+".tmp", file_name)
+
+
+def normalize_name(participant_name):
+    return(re.sub(r"\s+", " ", participant_name.strip().lower()))
+
+
+def make_columns(records, column_names):
+    return({ column_name: [ record[column_name] for record in records ] for column_name in column_names })
+
+
+def make_statistics(summaries):
+    quizzes = []
+    questions = []
+    players = {}
+    for summary in sorted(summaries, key=lambda summary: (summary["quiz_date"], summary["quiz_id"])):
+        quizzes.append({ "quiz_id": summary["quiz_id"], "quiz_name": summary["quiz_name"], "quiz_date": summary["quiz_date"],
+                         "nbr_of_questions": summary["nbr_of_questions"], "participants": len(summary["participants"]) })
+        for question in summary["questions"]:
+            difficulty = None
+            if question["checked"] > 0:
+                difficulty = 1.0-question["correct"]/question["checked"]
+            questions.append(dict(question, quiz_id=summary["quiz_id"], difficulty=difficulty))
+        for participant in summary["participants"]:
+            key = normalize_name(participant["participant_name"])
+            if key not in players:
+                players[key] = { "participant_name": participant["participant_name"], "quizzes": 0, "wins": 0, "best_rank": participant["rank"],
+                                 "correct_answers": 0, "questions": 0, "solos": 0 }
+            player = players[key]
+            player["participant_name"] = participant["participant_name"]
+            player["quizzes"] += 1
+            player["correct_answers"] += participant["correct_answers"]
+            player["questions"] += summary["nbr_of_questions"]
+            player["solos"] += participant["solos"]
+            player["best_rank"] = min(player["best_rank"], participant["rank"])
+            if participant["rank"] == 1:
+                player["wins"] += 1
+    for player in players.values():
+        player["score_fraction"] = player["correct_answers"]/player["questions"] if player["questions"] > 0 else 0.0
+    leaderboard = sorted(players.values(), key=lambda player: (-player["correct_answers"], -player["wins"], player["participant_name"]))
+    return({ "quizzes": make_columns(quizzes, [ "quiz_id", "quiz_name", "quiz_date", "nbr_of_questions", "participants" ]),
+             "leaderboard": make_columns(leaderboard, [ "participant_name", "quizzes", "wins", "best_rank", "correct_answers", "questions", "score_fraction", "solos" ]),
+             "questions": make_columns(questions, [ "quiz_id", "question_nbr", "answered", "checked", "correct", "difficulty" ]) })
+
+
+def chunk_list(items, nbr_of_chunks):
+    return([ items[i::nbr_of_chunks] for i in range(0, nbr_of_chunks) if len(items[i::nbr_of_chunks]) > 0 ])
+
+
+def collect_statistics(data_dir, output_file, cache_file):
+    load_online_quiz(data_dir)
+    cache = read_cache(cache_file)
+    summaries = {}
+    changed_quiz_ids = []
+    for quiz_id in list_quiz_ids(data_dir):
+        if quiz_id in cache and cache[quiz_id]["version"] == get_quiz_version(quiz_id):
+            summaries[quiz_id] = cache[quiz_id]["summary"]
+        else:
+            changed_quiz_ids.append(quiz_id)
+    if len(changed_quiz_ids) > 0:
+        nbr_of_workers = min(len(changed_quiz_ids), os.cpu_count() or 1)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=nbr_of_workers, initializer=load_online_quiz, initargs=(data_dir,)) as executor:
+            for chunk_results in executor.map(summarize_quizzes, chunk_list(changed_quiz_ids, 4*nbr_of_workers)):
+                for quiz_id, version, summary in chunk_results:
+                    summaries[quiz_id] = summary
+                    cache[quiz_id] = { "version": version, "summary": summary }
+    write_json({ "format": CACHE_FORMAT, "quizzes": { quiz_id: cache[quiz_id] for quiz_id in summaries } }, cache_file)
+    write_json(make_statistics([ summary for summary in summaries.values() if summary != None ]), output_file)
+    return(len(summaries), len(changed_quiz_ids))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or len(sys.argv) > 4:
+        sys.exit("usage: quiz_statistics.py data_dir output_file [cache_file]")
+    data_dir, output_file = sys.argv[1], sys.argv[2]
+    cache_file = sys.argv[3] if len(sys.argv) > 3 else os.path.join(data_dir, CACHE_FILE)
+    nbr_of_quizzes, nbr_of_changed_quizzes = collect_statistics(data_dir, output_file, cache_file)
+    print("{0} quizzes, {1} read, {2} from cache".format(nbr_of_quizzes, nbr_of_changed_quizzes, nbr_of_quizzes-nbr_of_changed_quizzes))
@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+# snapshot_log.py: snapshots of online quiz participant log files
+# usage: snapshot_log.py quiz_dir [quiz_dir ...]
+# a snapshot keeps the latest row per answer, check, status and checker
+# up to a checkpoint offset; readers replay only the log after it, while
+# the log file itself is left untouched as the full audit trail
+
+import csv
+import fcntl
+import hashlib
+import io
+import os
+import re
+import sys
+
+
+SNAPSHOT_SUFFIX = ".snapshot"
+SNAPSHOT = "SNAPSHOT"
+
+
+def get_row_key(row, position):
+    # rows with the same key replace each other when the log is replayed
+    if len(row) > 4 and row[1] == "PARTICIPANT":
+        return((row[1], row[2], row[4]))
+    if len(row) > 5 and row[1] in ("ANSWER", "STATUS"):
+        # STATUS keeps one row per status value: the quiz state needs the
+        # time of the last start to compute the time of finishing
+        return((row[1], row[2], row[3], row[4], row[5]))
+    if len(row) > 5 and row[1] == "CHECK":
+        return((row[1], row[2], row[3], row[5]))
+    if len(row) > 3 and row[1] == "CHECKER":
+        return((row[1], row[2], row[3]))
+    return(position)
+
+
+def compact_rows(rows):
+    last_positions = {}
+    for position in range(0, len(rows)):
+        last_positions[get_row_key(rows[position], position)] = position
+    kept_positions = sorted(last_positions.values())
+    # participant rows go first: other rows of unknown participants are ignored
+    participant_rows = [ rows[position] for position in kept_positions if rows[position][1] == "PARTICIPANT" ]
+    other_rows = [ rows[position] for position in kept_positions if rows[position][1] != "PARTICIPANT" ]
+    return(participant_rows+other_rows)
+
+
+def read_complete_lines(infile, offset=0):
+    infile.seek(offset)
+    data = infile.read()
+    # a row which is still being written is left for the next read
+    return(data[:data.rfind(b"\n")+1])
+
+
+def parse_rows(data):
+    return([ row for row in csv.reader(io.StringIO(data.decode("utf-8"))) if len(row) > 2 ])
+
+
+def get_last_line(data):
+    return(data[data.rfind(b"\n", 0, len(data)-1)+1:])
+
+
+def make_snapshot(file_name):
+    infile = open(file_name, "rb")
+    fcntl.flock(infile, fcntl.LOCK_SH)
+    data = read_complete_lines(infile)
+    infile.close()
+    rows = parse_rows(data)
+    compacted_rows = compact_rows(rows)
+    if len(data) == 0 or len(compacted_rows) == len(rows):
+        return(False)
+    last_line = get_last_line(data)
+    text = io.StringIO()
+    csvwriter = csv.writer(text)
+    csvwriter.writerow([SNAPSHOT, len(data), len(last_line), hashlib.sha1(last_line).hexdigest(), len(rows)])
+    csvwriter.writerows(compacted_rows)
+    # write and rename, so readers never see half a snapshot
+    outfile = open(file_name+SNAPSHOT_SUFFIX+".tmp", "wb")
+    outfile.write(text.getvalue().encode("utf-8"))
+    outfile.close()
+    os.replace(file_name+SNAPSHOT_SUFFIX+".tmp", file_name+SNAPSHOT_SUFFIX)
+    return(True)
+
+
+def read_snapshot(log_file, snapshot_file_name):
+    # log_file: the open log file, to check that the snapshot belongs to it
+    try:
+        infile = open(snapshot_file_name, "rb")
+    except FileNotFoundError:
+        return([], 0)
+    data = infile.read()
+    infile.close()
+    rows = [ row for row in csv.reader(io.StringIO(data.decode("utf-8"))) ]
+    if len(rows) == 0 or len(rows[0]) != 5 or rows[0][0] != SNAPSHOT:
+        return([], 0)
+    checkpoint, last_line_length, last_line_hash = int(rows[0][1]), int(rows[0][2]), rows[0][3]
+    if checkpoint < last_line_length:
+        return([], 0)
+    log_file.seek(checkpoint-last_line_length)
+    if hashlib.sha1(log_file.read(last_line_length)).hexdigest() != last_line_hash:
+        return([], 0)
+    return(rows[1:], checkpoint)
+
+
+def make_snapshots(quiz_dir):
+    nbr_of_snapshots = 0
+    for file_name in sorted(os.listdir(quiz_dir)):
+        if re.search("^[0-9]+$", file_name) and make_snapshot(os.path.join(quiz_dir, file_name)):
+            nbr_of_snapshots += 1
+    return(nbr_of_snapshots)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage: snapshot_log.py quiz_dir [quiz_dir ...]")
+    for quiz_dir in sys.argv[1:]:
+        print("{0}: {1} snapshots".format(quiz_dir, make_snapshots(quiz_dir)))
@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+# sqlite_log.py: storage of online quiz log files in an SQLite database
+# usage: sqlite_log.py import data_dir database_file [quiz_id ...]
+#        sqlite_log.py rebuild database_file
+# the table log keeps every row; answers, checks, status and checkers
+# keep the latest row per key of the participant files for indexed lookups
+
+import csv
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+import binary_log
+
+
+CSV_LOG_FILE = "logfile.csv"
+IMPORTED_DIR = "imported"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS log (row_id INTEGER PRIMARY KEY, quiz_id TEXT NOT NULL, file_name TEXT NOT NULL, event TEXT NOT NULL, row TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS log_file ON log (quiz_id, file_name, row_id);
+CREATE TABLE IF NOT EXISTS answers (quiz_id TEXT, participant_id TEXT, question_nbr TEXT, ip_address TEXT, answer TEXT, row_id INTEGER, PRIMARY KEY (quiz_id, participant_id, question_nbr, ip_address));
+CREATE TABLE IF NOT EXISTS checks (quiz_id TEXT, participant_id TEXT, question_nbr TEXT, check_status TEXT, row_id INTEGER, PRIMARY KEY (quiz_id, participant_id, question_nbr));
+CREATE TABLE IF NOT EXISTS status (quiz_id TEXT, participant_id TEXT, ip_address TEXT, status TEXT, row_id INTEGER, PRIMARY KEY (quiz_id, participant_id, ip_address));
+CREATE TABLE IF NOT EXISTS checkers (quiz_id TEXT, checker_id TEXT, checkee_id TEXT, row_id INTEGER, PRIMARY KEY (quiz_id, checker_id));
+"""
+
+connections = threading.local()
+
+
+def connect(database_file):
+    if not hasattr(connections, "databases"):
+        connections.databases = {}
+    if database_file not in connections.databases:
+        connection = sqlite3.connect(database_file, timeout=60)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        connections.databases[database_file] = connection
+    return(connections.databases[database_file])
+
+
+def add_row_to_tables(connection, row_id, row, file_name):
+    # the readers of participant data only read the participant files: the
+    # quiz log also has STATUS and ANSWER rows, which mark the quiz phases
+    if file_name == CSV_LOG_FILE:
+        return
+    if len(row) > 6 and row[1] == "ANSWER":
+        connection.execute("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)", (row[2], row[4], row[5], row[3], row[6], row_id))
+    elif len(row) > 6 and row[1] == "CHECK":
+        connection.execute("INSERT OR REPLACE INTO checks VALUES (?, ?, ?, ?, ?)", (row[2], row[3], row[5], row[6], row_id))
+    elif len(row) > 5 and row[1] == "STATUS":
+        connection.execute("INSERT OR REPLACE INTO status VALUES (?, ?, ?, ?, ?)", (row[2], row[4], row[3], row[5], row_id))
+    elif len(row) > 4 and row[1] == "CHECKER":
+        connection.execute("INSERT OR REPLACE INTO checkers VALUES (?, ?, ?, ?)", (row[2], row[3], row[4], row_id))
+
+
+def append_rows(database_file, quiz_id, file_name, rows):
+    connection = connect(database_file)
+    with connection:
+        for row in rows:
+            row = [ str(value) for value in row ]
+            event = ""
+            if len(row) > 1:
+                event = row[1]
+            cursor = connection.execute("INSERT INTO log (quiz_id, file_name, event, row) VALUES (?, ?, ?, ?)", (quiz_id, file_name, event, json.dumps(row)))
+            add_row_to_tables(connection, cursor.lastrowid, row, file_name)
+
+
+def rebuild_tables(database_file):
+    # for databases whose tables were filled from the quiz logs too
+    connection = connect(database_file)
+    with connection:
+        for table_name in ("answers", "checks", "status", "checkers"):
+            connection.execute("DELETE FROM {0}".format(table_name))
+        for row_id, file_name, row in connection.execute("SELECT row_id, file_name, row FROM log ORDER BY row_id").fetchall():
+            add_row_to_tables(connection, row_id, json.loads(row), file_name)
+
+
+def has_quiz(database_file, quiz_id):
+    cursor = connect(database_file).execute("SELECT 1 FROM log WHERE quiz_id = ? LIMIT 1", (quiz_id,))
+    return(cursor.fetchone() != None)
+
+
+def has_file(database_file, quiz_id, file_name):
+    cursor = connect(database_file).execute("SELECT 1 FROM log WHERE quiz_id = ? AND file_name = ? LIMIT 1", (quiz_id, file_name))
+    return(cursor.fetchone() != None)
+
+
+def get_file_offsets(database_file, quiz_id):
+    cursor = connect(database_file).execute("SELECT file_name, max(row_id) FROM log WHERE quiz_id = ? GROUP BY file_name", (quiz_id,))
+    return({ file_name: row_id for file_name, row_id in cursor })
+
+
+def read_rows(database_file, quiz_id, file_name, offset=0, events=None):
+    query = "SELECT row_id, row FROM log WHERE quiz_id = ? AND file_name = ? AND row_id > ?"
+    parameters = [ quiz_id, file_name, offset ]
+    if events != None:
+        query += " AND event IN ({0})".format(",".join([ "?" for event in events ]))
+        parameters.extend(events)
+    rows = []
+    for row_id, row in connect(database_file).execute(query+" ORDER BY row_id", parameters):
+        rows.append(json.loads(row))
+        offset = row_id
+    return([ row for row in rows if len(row) > 2 ], offset)
+
+
+def read_answers(database_file, quiz_id, participant_id, ip_address=None, question_nbrs=None):
+    query = "SELECT question_nbr, answer FROM answers WHERE quiz_id = ? AND participant_id = ?"
+    parameters = [ quiz_id, participant_id ]
+    if ip_address != None:
+        query += " AND ip_address = ?"
+        parameters.append(ip_address)
+    if question_nbrs != None:
+        query += " AND question_nbr IN ({0})".format(", ".join([ "?" ]*len(question_nbrs)))
+        parameters += question_nbrs
+    return(connect(database_file).execute(query+" ORDER BY row_id", parameters).fetchall())
+
+
+def read_status(database_file, quiz_id, participant_id, ip_address):
+    cursor = connect(database_file).execute("SELECT status FROM status WHERE quiz_id = ? AND participant_id = ? AND ip_address = ?", (quiz_id, participant_id, ip_address))
+    row = cursor.fetchone()
+    if row == None:
+        return("")
+    return(row[0])
+
+
+def read_checkee_id(database_file, quiz_id, checker_id):
+    cursor = connect(database_file).execute("SELECT checkee_id FROM checkers WHERE quiz_id = ? AND checker_id = ?", (quiz_id, checker_id))
+    row = cursor.fetchone()
+    if row == None:
+        return(None)
+    return(row[0])
+
+
+def import_quiz(data_dir, database_file, quiz_id):
+    quiz_dir = os.path.join(data_dir, quiz_id)
+    if has_quiz(database_file, quiz_id):
+        return(False)
+    log_files = []
+    for file_name in sorted(os.listdir(quiz_dir)):
+        if file_name == CSV_LOG_FILE or re.search("^[0-9]+$", file_name):
+            infile = open(os.path.join(quiz_dir, file_name), "r", newline="")
+            rows = [ row for row in csv.reader(infile) ]
+            infile.close()
+            log_files.append((file_name, file_name, rows))
+        elif file_name == binary_log.BINARY_LOG_FILE:
+            rows, offset = binary_log.read_rows(os.path.join(quiz_dir, file_name))
+            log_files.append((file_name, CSV_LOG_FILE, rows))
+        elif re.search("^[0-9]+"+re.escape(binary_log.BINARY_SUFFIX)+"$", file_name):
+            rows, offset = binary_log.read_rows(os.path.join(quiz_dir, file_name))
+            log_files.append((file_name, file_name[:-len(binary_log.BINARY_SUFFIX)], rows))
+    if len(log_files) == 0:
+        return(False)
+    for file_name, log_file_name, rows in log_files:
+        append_rows(database_file, quiz_id, log_file_name, rows)
+    # the original files are kept, but moved out of the way of the readers
+    os.makedirs(os.path.join(quiz_dir, IMPORTED_DIR), exist_ok=True)
+    for file_name, log_file_name, rows in log_files:
+        os.rename(os.path.join(quiz_dir, file_name), os.path.join(quiz_dir, IMPORTED_DIR, file_name))
+    return(True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "rebuild":
+        rebuild_tables(sys.argv[2])
+        sys.exit(0)
+    if len(sys.argv) < 4 or sys.argv[1] != "import":
+        sys.exit("usage: sqlite_log.py import data_dir database_file [quiz_id ...]\n       sqlite_log.py rebuild database_file")
+    data_dir, database_file = sys.argv[2], sys.argv[3]
+    quiz_ids = sys.argv[4:]
+    if len(quiz_ids) == 0:
+        quiz_ids = [ file_name for file_name in sorted(os.listdir(data_dir)) if re.search("^[0-9]+$", file_name) ]
+    for quiz_id in quiz_ids:
+        if import_quiz(data_dir, database_file, quiz_id):
+            print("imported quiz {0}".format(quiz_id))
+        else:
+            print("skipped quiz {0}".format(quiz_id))
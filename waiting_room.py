@@ -0,0 +1,181 @@
+#!/usr/bin/python3
+# waiting_room.py: long-poll server which tells waiting participants when answering starts
+# usage: ONLINE_QUIZ_DATA_DIR=/path/to/quizzes/ waiting_room.py [host [port]]
+# all clients waiting for a quiz share one watcher, which checks the size
+# of the quiz log file and only reads the rows added since its last check;
+# the scoreboard event streams of the result pages are served here too,
+# so that they do not hold CGI processes or WSGI worker threads;
+# needs Python 3.7 or later (asyncio.run, create_task, get_running_loop),
+# unlike the application, which still runs under the CGI target's Python 3.5
+
+import asyncio
+import json
+import os
+import re
+import sys
+import urllib.parse
+
+import online_quiz
+
+
+HOST = "127.0.0.1"
+PORT = 8001
+POLL_INTERVAL = 0.5 # seconds between checks of the log file size
+DEFAULT_TIMEOUT = 25.0 # seconds: below the read timeout of most proxies
+MAX_TIMEOUT = 60.0
+HEADER_TIMEOUT = 10.0
+MAX_HEADER_LINES = 100
+
+quiz_watchers = {}
+
+
+def get_log_file_size(quiz_id):
+    if online_quiz.get_storage_mode(quiz_id) == online_quiz.SQLITE_STORAGE:
+        return(online_quiz.sqlite_log.get_file_offsets(online_quiz.DATABASE_FILE, quiz_id).get(online_quiz.LOG_FILE, 0))
+    try:
+        return(os.stat(online_quiz.DATA_DIR+quiz_id+"/"+online_quiz.get_log_file_name(quiz_id)).st_size)
+    except FileNotFoundError:
+        return(0)
+
+
+def read_answering_started(quiz_id, offset):
+    # the same markers as read_log_quiz_details, in the new rows only
+    rows, offset = online_quiz.read_log_rows(quiz_id, online_quiz.get_log_file_name(quiz_id), offset=offset, events=[online_quiz.ANSWER, online_quiz.STATUS])
+    for row in rows:
+        if row[1] == online_quiz.ANSWER and row[2] == quiz_id:
+            return(True, offset)
+        if row[1] == online_quiz.STATUS and row[2] == quiz_id and row[5] == online_quiz.STARTED:
+            return(True, offset)
+    return(False, offset)
+
+
+def get_quiz_watcher(quiz_id):
+    if quiz_id not in quiz_watchers:
+        quiz_watchers[quiz_id] = { "started": asyncio.Event(), "size": -1, "offset": 0, "waiters": 0, "task": None }
+    return(quiz_watchers[quiz_id])
+
+
+def release_quiz_watcher(quiz_id, quiz_watcher):
+    # a quiz nobody waits for is forgotten: a later waiter reads its log again
+    if quiz_watcher["waiters"] == 0 and quiz_watcher["task"] == None and quiz_watchers.get(quiz_id) is quiz_watcher:
+        del quiz_watchers[quiz_id]
+
+
+async def watch_quiz(quiz_id, quiz_watcher):
+    loop = asyncio.get_running_loop()
+    try:
+        while quiz_watcher["waiters"] > 0 and not quiz_watcher["started"].is_set():
+            # file reads run in the default executor so that they do not block the event loop
+            size = await loop.run_in_executor(None, get_log_file_size, quiz_id)
+            if size != quiz_watcher["size"]:
+                if size < quiz_watcher["offset"]:
+                    quiz_watcher["offset"] = 0
+                quiz_watcher["size"] = size
+                started, quiz_watcher["offset"] = await loop.run_in_executor(None, read_answering_started, quiz_id, quiz_watcher["offset"])
+                if started:
+                    quiz_watcher["started"].set()
+                    break
+            await asyncio.sleep(POLL_INTERVAL)
+    finally:
+        quiz_watcher["task"] = None
+        release_quiz_watcher(quiz_id, quiz_watcher)
+
+
+async def wait_for_start(quiz_id, timeout, reader):
+    quiz_watcher = get_quiz_watcher(quiz_id)
+    if quiz_watcher["started"].is_set():
+        release_quiz_watcher(quiz_id, quiz_watcher)
+        return(True)
+    quiz_watcher["waiters"] += 1
+    if quiz_watcher["task"] == None:
+        quiz_watcher["task"] = asyncio.create_task(watch_quiz(quiz_id, quiz_watcher))
+    started_task = asyncio.create_task(quiz_watcher["started"].wait())
+    # a read which returns means that the client went away
+    closed_task = asyncio.create_task(reader.read(1))
+    try:
+        await asyncio.wait([ started_task, closed_task ], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        started_task.cancel()
+        closed_task.cancel()
+        quiz_watcher["waiters"] -= 1
+        release_quiz_watcher(quiz_id, quiz_watcher)
+    return(quiz_watcher["started"].is_set())
+
+
+async def stream_scoreboard(quiz_id, reader, writer):
+    loop = asyncio.get_running_loop()
+    scoreboard_stream = online_quiz.make_scoreboard_stream()
+    header = "HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\nCache-Control: no-cache\r\nX-Accel-Buffering: no\r\nConnection: close\r\n\r\n"
+    writer.write(header.encode("latin-1")+b"retry: 5000\n\n")
+    await writer.drain()
+    # a read which returns means that the client went away
+    closed_task = asyncio.create_task(reader.read(1))
+    try:
+        start_time = loop.time()
+        while loop.time()-start_time < online_quiz.SCOREBOARD_STREAM_DURATION:
+            # reading the logs blocks: it runs in the default thread pool
+            event = await loop.run_in_executor(None, online_quiz.make_scoreboard_event, quiz_id, scoreboard_stream)
+            if event != "":
+                writer.write(event.encode("utf-8"))
+                await writer.drain()
+            await asyncio.wait([ closed_task ], timeout=online_quiz.SCOREBOARD_POLL_INTERVAL)
+            if closed_task.done():
+                break
+    finally:
+        closed_task.cancel()
+
+
+def make_response(status, body):
+    body_bytes = json.dumps(body).encode("utf-8")
+    header = "HTTP/1.1 {0}\r\nContent-Type: application/json\r\nContent-Length: {1}\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n".format(status, len(body_bytes))
+    return(header.encode("latin-1")+body_bytes)
+
+
+async def read_request(reader):
+    request_line = await reader.readline()
+    for i in range(0, MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return(request_line.decode("latin-1").split())
+    raise ValueError("too many header lines")
+
+
+async def handle_connection(reader, writer):
+    try:
+        request_fields = await asyncio.wait_for(read_request(reader), HEADER_TIMEOUT)
+        url = urllib.parse.urlsplit(request_fields[1] if len(request_fields) == 3 else "")
+        query = urllib.parse.parse_qs(url.query)
+        quiz_id = query.get("quiz_id", [""])[0]
+        if len(request_fields) != 3 or request_fields[0] != "GET":
+            response = make_response("405 Method Not Allowed", { "error": "only GET is supported" })
+        elif not re.search("^[0-9]+$", quiz_id) or not os.path.isdir(online_quiz.DATA_DIR+quiz_id):
+            response = make_response("404 Not Found", { "error": "unknown quiz" })
+        elif url.path.endswith("/"+online_quiz.SCOREBOARD_EVENTS):
+            await stream_scoreboard(quiz_id, reader, writer)
+            return
+        elif not url.path.endswith("/"+online_quiz.WAIT_FOR_START):
+            response = make_response("404 Not Found", { "error": "unknown path" })
+        else:
+            timeout = DEFAULT_TIMEOUT
+            if re.search(r"^[0-9]+(\.[0-9]+)?$", query.get("timeout", [""])[0]):
+                timeout = min(float(query["timeout"][0]), MAX_TIMEOUT)
+            started = await wait_for_start(quiz_id, timeout, reader)
+            response = make_response("200 OK", { "quiz_id": quiz_id, "answering_started": started })
+        writer.write(response)
+        await writer.drain()
+    except (ValueError, asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port):
+    server = await asyncio.start_server(handle_connection, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    host = sys.argv[1] if len(sys.argv) > 1 else HOST
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else PORT
+    asyncio.run(serve(host, port))